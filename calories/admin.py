@@ -1,20 +1,36 @@
 from django.contrib import admin
-from .models import Food, UserProfile, CalorieEntry
+from django.utils.decorators import method_decorator
+from .models import Food, UserProfile, CalorieEntry, DailyTotal
+from .routers import read_from_replica
+
+class ReplicaListMixin:
+    """
+    Read list pages from a replica. The page is rendered here, inside the
+    replica scope, since the result rows and date hierarchy are only
+    queried while the template renders. Actions and edits use the primary.
+    """
+
+    @method_decorator(read_from_replica)
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
 
 @admin.register(Food)
-class FoodAdmin(admin.ModelAdmin):
+class FoodAdmin(ReplicaListMixin, admin.ModelAdmin):
     list_display = ['name', 'serving', 'calories_per_serving']
     list_filter = ['calories_per_serving']
     search_fields = ['name']
     ordering = ['name']
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(ReplicaListMixin, admin.ModelAdmin):
     list_display = ['user', 'daily_calorie_goal', 'created_at']
     list_filter = ['created_at']
 
 @admin.register(CalorieEntry)
-class CalorieEntryAdmin(admin.ModelAdmin):
+class CalorieEntryAdmin(ReplicaListMixin, admin.ModelAdmin):
     list_display = ['user', 'food', 'quantity', 'total_calories', 'date', 'time_added']
     list_filter = ['date', 'time_added']
     search_fields = ['user__username', 'food__name']
@@ -22,4 +38,13 @@ class CalorieEntryAdmin(admin.ModelAdmin):
     
     def total_calories(self, obj):
         return obj.total_calories
-    total_calories.short_description = 'Total Calories'
\ No newline at end of file
+    total_calories.short_description = 'Total Calories'
+
+@admin.register(DailyTotal)
+class DailyTotalAdmin(ReplicaListMixin, admin.ModelAdmin):
+    list_display = ['user', 'date', 'calories', 'entry_count']
+    list_filter = ['date']
+    search_fields = ['user__username']
+    date_hierarchy = 'date'
+    # Maintained from CalorieEntry writes; edit entries instead
+    readonly_fields = ['user', 'date', 'calories', 'entry_count']
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, namedtuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Per-process hit/miss counters, keyed by cache name
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record_outcome(name, outcome):
+    """
+    Count one ``outcome`` for the cache ``name`` in ``cache_stats``; for
+    caches kept outside ``get_or_compute``
+    """
+    with _stats_lock:
+        _stats[(name, outcome)] += 1
+
+
+def cache_stats():
+    """
+    Return ``{name: {outcome: count}}`` for this process. Outcomes are
+    ``hit``, ``miss`` (this worker recomputed), ``early`` (this worker
+    refreshed a value about to expire), ``wait_hit`` (another worker
+    recomputed while we waited) and ``wait_timeout``.
+    """
+    with _stats_lock:
+        items = list(_stats.items())
+    stats = {}
+    for (name, outcome), count in items:
+        stats.setdefault(name, {})[outcome] = count
+    return stats
+
+
+class LRUCache:
+    """
+    Thread-safe in-process mapping of at most ``max_size`` items that each
+    expire ``ttl`` seconds after being set; when full, the least recently
+    used item is evicted. Values are treated as immutable: ``update``
+    swaps in a new value rather than changing the stored one.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _live(self, key):
+        """Return the unexpired ``(expires, value)`` for ``key`` or None; lock held"""
+        item = self._items.get(key)
+        if item is not None and item[0] <= time.monotonic():
+            del self._items[key]
+            item = None
+        return item
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                return default
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def update(self, key, func):
+        """
+        Replace a cached value with ``func(value)``, keeping its expiry.
+        Returns False, doing nothing, if ``key`` is not cached.
+        """
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                return False
+            self._items[key] = (item[0], func(item[1]))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class _Entry(namedtuple('_Entry', 'value delta expires')):
+    """
+    A value stored by ``get_or_compute``, with the seconds its computation
+    took and its expiry (epoch seconds, None for never)
+    """
+
+
+def _recompute_early(entry, beta):
+    """
+    Probabilistic early expiration: the closer an entry is to expiring, and
+    the longer it takes to compute, the likelier a reader is to refresh it
+    ahead of time, so it rarely expires while busy.
+    """
+    if entry.expires is None:
+        return False
+    return time.time() - entry.delta * beta * math.log(1.0 - random.random()) >= entry.expires
+
+
+def _entry(value, started, timeout):
+    return _Entry(
+        value,
+        time.perf_counter() - started,
+        None if timeout is None else time.time() + timeout
+    )
+
+
+def get_or_compute(name, key, compute, timeout, lock_timeout=10, max_wait=2.0, poll=0.05, beta=1.0):
+    """
+    Return the cached value for ``key`` or compute and store it.
+
+    Only one caller recomputes a missing key: it takes a short-lived lock
+    with ``cache.add`` while the others poll for the fresh value for up to
+    ``max_wait`` seconds before falling back to computing it themselves.
+    Before a value expires, a reader may recompute it early (``beta``
+    scales how early; 0 turns this off); the others keep getting the
+    current value meanwhile. ``name`` groups the hit/miss counters reported
+    by ``cache_stats``.
+    """
+    lock_key = f'{key}:lock'
+    stored = cache.get(key, _MISSING)
+    if stored is not _MISSING:
+        if not isinstance(stored, _Entry):
+            record_outcome(name, 'hit')
+            return stored
+        if beta and _recompute_early(stored, beta) and cache.add(lock_key, 1, lock_timeout):
+            record_outcome(name, 'early')
+            try:
+                started = time.perf_counter()
+                value = compute()
+                cache.set(key, _entry(value, started, timeout), timeout)
+                return value
+            finally:
+                cache.delete(lock_key)
+        record_outcome(name, 'hit')
+        return stored.value
+
+    if cache.add(lock_key, 1, lock_timeout):
+        record_outcome(name, 'miss')
+        try:
+            started = time.perf_counter()
+            value = compute()
+            cache.set(key, _entry(value, started, timeout), timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Another worker is recomputing; wait for its result
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        stored = cache.get(key, _MISSING)
+        if stored is not _MISSING:
+            record_outcome(name, 'wait_hit')
+            return stored.value if isinstance(stored, _Entry) else stored
+
+    record_outcome(name, 'wait_timeout')
+    logger.warning(f'Timed out waiting for {key} to be recomputed')
+    return compute()
+
+
+async def aget_or_compute(name, key, compute, timeout, lock_timeout=10, max_wait=2.0, poll=0.05, beta=1.0):
+    """
+    Async ``get_or_compute``; ``compute`` is a coroutine function. Waiting
+    for another worker's result sleeps without holding a thread.
+    """
+    lock_key = f'{key}:lock'
+    stored = await cache.aget(key, _MISSING)
+    if stored is not _MISSING:
+        if not isinstance(stored, _Entry):
+            record_outcome(name, 'hit')
+            return stored
+        if beta and _recompute_early(stored, beta) and await cache.aadd(lock_key, 1, lock_timeout):
+            record_outcome(name, 'early')
+            try:
+                started = time.perf_counter()
+                value = await compute()
+                await cache.aset(key, _entry(value, started, timeout), timeout)
+                return value
+            finally:
+                await cache.adelete(lock_key)
+        record_outcome(name, 'hit')
+        return stored.value
+
+    if await cache.aadd(lock_key, 1, lock_timeout):
+        record_outcome(name, 'miss')
+        try:
+            started = time.perf_counter()
+            value = await compute()
+            await cache.aset(key, _entry(value, started, timeout), timeout)
+            return value
+        finally:
+            await cache.adelete(lock_key)
+
+    # Another worker is recomputing; wait for its result
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        await asyncio.sleep(poll)
+        stored = await cache.aget(key, _MISSING)
+        if stored is not _MISSING:
+            record_outcome(name, 'wait_hit')
+            return stored.value if isinstance(stored, _Entry) else stored
+
+    record_outcome(name, 'wait_timeout')
+    logger.warning(f'Timed out waiting for {key} to be recomputed')
+    return await compute()
+
+
+def report_key(user_id, period):
+    """``period`` is ``YYYY-MM`` for a month report or ``YYYY`` for a year"""
+    return f'report:{user_id}:{period}'
+
+
+def user_version_key(user_id, namespace=''):
+    return f'user_version:{user_id}:{namespace}' if namespace else f'user_version:{user_id}'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+def get_user_version(user_id, namespace=''):
+    """
+    Opaque token that changes whenever anything in the user's ``namespace``
+    changes. The unnamed namespace covers everything shown on the user's
+    pages; named ones version groups of cached values (see ``user_key``).
+    A lost key is simply replaced by a new token, which only costs one
+    recomputation.
+    """
+    return _get_version(user_version_key(user_id, namespace))
+
+
+async def aget_user_version(user_id, namespace=''):
+    """Async ``get_user_version``"""
+    return await _aget_version(user_version_key(user_id, namespace))
+
+
+def bump_user_version(user_id, namespace=''):
+    cache.set(user_version_key(user_id, namespace), uuid.uuid4().hex, None)
+
+
+# Token shared by all users that changes with any food catalog change
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def get_catalog_version():
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+async def aget_catalog_version():
+    return await _aget_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def user_key(user_id, namespace, *parts):
+    """
+    Cache key in the user's versioned ``namespace``. Bumping the
+    namespace's version retires all of its keys with a single write; the
+    old entries are left to expire or be culled.
+    """
+    return ':'.join([namespace, str(user_id), get_user_version(user_id, namespace), *map(str, parts)])
+
+
+async def auser_key(user_id, namespace, *parts):
+    """Async ``user_key``"""
+    return ':'.join([namespace, str(user_id), await aget_user_version(user_id, namespace), *map(str, parts)])
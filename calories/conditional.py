@@ -0,0 +1,64 @@
+import hashlib
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .cache import aget_catalog_version, aget_user_version, get_catalog_version, get_user_version
+
+
+def page_etag(request, user_id, version, catalog_version):
+    """
+    Weak ETag of a user's page: their data version, the food catalog's
+    version (pages show food names and calories), the day (pages show
+    "today") and the full path, which carries cursors and filters. None
+    while flash messages are queued, since those are rendered only once.
+    """
+    if len(get_messages(request)):
+        return None
+    key = f'{user_id}:{version}:{catalog_version}:{date.today().isoformat()}:{request.get_full_path()}'
+    return 'W/"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+
+
+def _finish(request, response, etag):
+    if getattr(request, 'replica_reads', False):
+        # The replica may lag behind the version in the ETag; a validator
+        # for stale content would keep it alive through later 304s
+        return response
+    if etag and request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        # Make browsers and proxies revalidate rather than reuse silently
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(view):
+    """
+    Answer GETs whose ``If-None-Match`` matches the page's ETag with
+    ``304 Not Modified`` before the view runs, so neither its context nor
+    its template is built. The ETag comes from the per-user version
+    counter, which the ``entries_changed`` and profile receivers bump, and
+    the catalog version, which food changes bump.
+    Pages rendered from a replica get no ETag. Goes under
+    ``login_required`` and above ``read_from_replica``.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            user = await request.auser()
+            etag = page_etag(request, user.pk, await aget_user_version(user.pk), await aget_catalog_version())
+            response = get_conditional_response(request, etag=etag) if etag else None
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _finish(request, response, etag)
+    else:
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            etag = page_etag(request, request.user.pk, get_user_version(request.user.pk), get_catalog_version())
+            response = get_conditional_response(request, etag=etag) if etag else None
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finish(request, response, etag)
+    return inner
@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+import zlib
+
+from .models import CalorieEntry
+
+# Rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Bytes of encoded rows collected before a chunk is sent (and compressed)
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+EXPORT_FIELDS = ['date', 'time_added', 'food', 'serving', 'quantity', 'calories_per_serving', 'calories']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_queryset(user):
+    """
+    Every entry of ``user`` in chronological order, with its food joined in
+    the same query and only the exported columns loaded
+    """
+    return CalorieEntry.objects.filter(user=user).select_related('food').only(
+        'date', 'time_added', 'quantity', 'calories',
+        'food__name', 'food__serving', 'food__calories_per_serving'
+    ).order_by('date', 'time_added', 'id')
+
+
+class ExportEncoder:
+    """
+    Turn entries into byte chunks of CSV or NDJSON, gzip-compressed if
+    asked. Rows are buffered up to ``EXPORT_BUFFER_SIZE`` so the response
+    is not flushed once per row, and nothing else is retained, so memory
+    stays flat however long the history is.
+    """
+
+    def __init__(self, export_format, compress=False):
+        self.export_format = export_format
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer) if export_format == 'csv' else None
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self.compressor = zlib.compressobj(wbits=31) if compress else None
+        if self.writer is not None:
+            self.writer.writerow(EXPORT_FIELDS)
+
+    def feed(self, entry):
+        """Add one entry; return a chunk once enough has been buffered"""
+        row = [
+            entry.date.isoformat(),
+            entry.time_added.isoformat(),
+            entry.food.name,
+            entry.food.serving,
+            str(entry.quantity),
+            entry.food.calories_per_serving,
+            entry.calories,
+        ]
+        if self.writer is not None:
+            self.writer.writerow(row)
+        else:
+            self.buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n')
+
+        if self.buffer.tell() >= EXPORT_BUFFER_SIZE:
+            return self.flush()
+        return b''
+
+    def flush(self):
+        data = self.buffer.getvalue().encode('utf-8')
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        return data
+
+    def close(self):
+        """Return whatever is still buffered, plus the gzip trailer"""
+        data = self.flush()
+        if self.compressor is not None:
+            data += self.compressor.flush()
+        return data
+
+
+def stream_export(entries, encoder):
+    """Yield the encoded export, reading ``entries`` in chunks"""
+    for entry in entries.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk = encoder.feed(entry)
+        if chunk:
+            yield chunk
+    yield encoder.close()
+
+
+async def astream_export(entries, encoder):
+    """Async ``stream_export``, for responses served over ASGI"""
+    async for entry in entries.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk = encoder.feed(entry)
+        if chunk:
+            yield chunk
+    yield encoder.close()
@@ -1,15 +1,69 @@
+from decimal import Decimal
 from django import forms
+from django.urls import reverse_lazy
 from django.utils import timezone
 from .models import CalorieEntry, UserProfile, Food
 
+class RemoteFoodSelect(forms.Select):
+    """
+    Select that renders only the empty choice and the currently selected
+    food. Other options are fetched on demand from the food search API
+    (``data-search-url``) and added client-side, so the page never
+    carries the whole catalog.
+    """
+    
+    def __init__(self, attrs=None):
+        attrs = {'data-search-url': reverse_lazy('food_search_api'), **(attrs or {})}
+        super().__init__(attrs)
+    
+    def optgroups(self, name, value, attrs=None):
+        selected = [str(v) for v in value if v not in (None, '')]
+        choices = [('', self.choices.field.empty_label or '')]
+        if selected:
+            # Reuse the food the field looked up while validating, otherwise
+            # one primary-key lookup; never the whole catalog
+            cached = getattr(self.choices.field, 'selected_food', None)
+            if cached is not None and str(cached.pk) in selected:
+                foods = [cached]
+            else:
+                try:
+                    foods = list(self.choices.queryset.order_by().filter(pk__in=selected))
+                except (ValueError, TypeError):
+                    foods = []
+            choices += [(str(food.pk), str(food)) for food in foods]
+        
+        groups = []
+        for index, (option_value, label) in enumerate(choices):
+            groups.append((None, [self.create_option(
+                name,
+                option_value,
+                label,
+                option_value in selected,
+                index,
+                attrs=attrs
+            )], index))
+        return groups
+
+class FoodChoiceField(forms.ModelChoiceField):
+    """Food choice backed by RemoteFoodSelect, validated by primary key"""
+    widget = RemoteFoodSelect
+    
+    def to_python(self, value):
+        food = super().to_python(value)
+        self.selected_food = food
+        return food
+
 class CalorieEntryForm(forms.ModelForm):
     """Form for adding/editing calorie entries"""
     
     class Meta:
         model = CalorieEntry
         fields = ['food', 'quantity', 'date']
+        field_classes = {
+            'food': FoodChoiceField
+        }
         widgets = {
-            'food': forms.Select(attrs={
+            'food': RemoteFoodSelect(attrs={
                 'class': 'form-control food-select',
                 'id': 'id_food'
             }),
@@ -28,14 +82,51 @@ class CalorieEntryForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Order foods alphabetically
-        self.fields['food'].queryset = Food.objects.all().order_by('name')
+        # Validation is a single primary-key lookup; the widget never
+        # iterates this queryset
+        self.fields['food'].queryset = Food.objects.order_by()
         self.fields['food'].empty_label = "Select a food item..."
         
         # Set default values
         if not self.instance.pk:  # Only for new entries
             self.fields['date'].initial = timezone.now().date()
             self.fields['quantity'].initial = 1.0
+    
+    def _get_validation_exclusions(self):
+        # FoodChoiceField already fetched the food by primary key; skip the
+        # model's second existence query for the same row
+        exclude = super()._get_validation_exclusions()
+        exclude.add('food')
+        return exclude
+
+class BatchEntryItemForm(forms.Form):
+    """
+    One item of a batch entry request. Only checks the shape of the item;
+    the food ids of the whole batch are looked up together by the view.
+    """
+    food_id = forms.IntegerField(min_value=1)
+    quantity = forms.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal('0.01'), required=False
+    )
+    date = forms.DateField(required=False)
+    
+    def clean_quantity(self):
+        quantity = self.cleaned_data['quantity']
+        return Decimal('1.0') if quantity is None else quantity
+    
+    def clean_date(self):
+        return self.cleaned_data['date'] or timezone.now().date()
+
+class HistoryImportForm(forms.Form):
+    """Upload form for importing history from another tracker"""
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.gz'
+        }),
+        label='CSV file',
+        help_text='Columns: date (YYYY-MM-DD), food, quantity (optional). Gzipped files are accepted.'
+    )
 
 class UserProfileForm(forms.ModelForm):
     """Form for editing user profile settings"""
@@ -0,0 +1,120 @@
+import csv
+import gzip
+import io
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import CalorieEntry
+from .search import build_index
+from .signals import entries_changed
+
+# Entries per bulk insert
+IMPORT_BATCH_SIZE = 5000
+
+# Problem rows listed individually in a report; any further ones are only
+# counted
+IMPORT_PROBLEM_LIMIT = 100
+
+# Days per rollup refresh, keeping each refresh's date IN list short
+REFRESH_DAYS = 500
+
+MAX_QUANTITY = Decimal('999.99')
+
+
+def open_history_file(file, name=''):
+    """
+    Wrap a binary file as CSV text, decompressing it on the fly when
+    ``name`` ends in ``.gz`` (as the history export produces)
+    """
+    if name.endswith('.gz'):
+        file = gzip.GzipFile(fileobj=file)
+    return io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+
+def parse_quantity(text):
+    """A positive quantity with two decimals; blank means one serving"""
+    text = (text or '').strip()
+    if not text:
+        return Decimal('1.00')
+    try:
+        quantity = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f'Invalid quantity: {text}')
+    if not quantity.is_finite() or quantity <= 0 or quantity > MAX_QUANTITY:
+        raise ValueError(f'Invalid quantity: {text}')
+    return quantity.quantize(Decimal('0.01'))
+
+
+def import_history(user, lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import entries for ``user`` from CSV text with ``date`` (YYYY-MM-DD) and
+    ``food`` columns and an optional ``quantity`` column; other columns,
+    such as those of the history export, are ignored.
+
+    The file is read row by row, food names are resolved against the name
+    map of a search index built afresh for the import (the cached one may
+    be up to FOOD_SEARCH_INDEX_TTL seconds behind the catalog), and entries
+    are inserted in ``batch_size`` chunks, all in one transaction. Returns a report of the entries created
+    and of the rows that were skipped because their food is not in the
+    catalog (``unresolved``) or their date or quantity is bad (``invalid``).
+    """
+    reader = csv.DictReader(lines)
+    columns = {name.strip().casefold(): name for name in reader.fieldnames or []}
+    if 'date' not in columns or 'food' not in columns:
+        raise ValueError('The CSV needs a header row with "date" and "food" columns')
+
+    names = build_index()
+    report = {'created': 0, 'unresolved': 0, 'invalid': 0, 'problems': []}
+
+    def problem(kind, line, food, error):
+        report[kind] += 1
+        if len(report['problems']) < IMPORT_PROBLEM_LIMIT:
+            report['problems'].append({'line': line, 'food': food, 'error': error})
+
+    batch = []
+    dates = set()
+    with transaction.atomic():
+        for row in reader:
+            name = (row[columns['food']] or '').strip()
+            try:
+                day = date.fromisoformat((row[columns['date']] or '').strip())
+                quantity = parse_quantity(row[columns['quantity']] if 'quantity' in columns else '')
+            except ValueError as e:
+                problem('invalid', reader.line_num, name, str(e))
+                continue
+
+            food = names.lookup(name)
+            if food is None:
+                problem('unresolved', reader.line_num, name, 'Food not found in the catalog')
+                continue
+
+            batch.append(CalorieEntry(
+                user_id=user.pk,
+                food_id=food['id'],
+                quantity=quantity,
+                date=day,
+                calories=CalorieEntry.calories_for(food['calories'], quantity)
+            ))
+            dates.add(day)
+            if len(batch) >= batch_size:
+                CalorieEntry.objects.bulk_create(batch)
+                report['created'] += len(batch)
+                batch = []
+
+        if batch:
+            CalorieEntry.objects.bulk_create(batch)
+            report['created'] += len(batch)
+
+        # bulk_create skips post_save; refresh the rollup, streak and
+        # dashboard cache for the imported days
+        dates = sorted(dates)
+        for start in range(0, len(dates), REFRESH_DAYS):
+            entries_changed.send(
+                sender=CalorieEntry,
+                user_id=user.pk,
+                dates=set(dates[start:start + REFRESH_DAYS])
+            )
+
+    return report
@@ -0,0 +1,186 @@
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+
+from calories import urls as calories_urls
+from calories.management.commands.setup_test_data import create_entries, refresh_derived_data
+from calories.models import Food, CalorieEntry
+
+# Query strings for views that need one to do real work
+VIEW_PARAMS = {
+    'food_search_api': {'q': 'ch'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database at a given scale and benchmark every calories URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3, help='Users to seed (default: 3)')
+        parser.add_argument('--days', type=int, default=90, help='Days of history per user (default: 90)')
+        parser.add_argument('--entries-per-day', type=int, default=4, help='Entries per user per day (default: 4)')
+        parser.add_argument('--foods', type=int, default=1000, help='Catalog size (default: 1000)')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per view (default: 20)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data (default: 0)')
+        parser.add_argument(
+            '--cold-cache',
+            action='store_true',
+            help='Clear the cache before every request instead of measuring warm reads',
+        )
+        parser.add_argument(
+            '--no-isolate',
+            action='store_true',
+            help='Seed and run in the current database instead of a throwaway test database',
+        )
+        parser.add_argument('--output', type=str, default=None, help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        old_name = None
+        if not options['no_isolate']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Only let the test client's host in; setup_test_environment()
+            # would also instrument template rendering and skew the timings
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                report = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS('Wrote benchmark report to %s' % options['output']))
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        started = time.perf_counter()
+        user, entry = self.seed(options)
+        seed_seconds = time.perf_counter() - started
+
+        client = Client()
+        client.force_login(user)
+
+        views = {}
+        for pattern in calories_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            views[pattern.name] = self.measure(client, user, pattern, entry, options)
+
+        return {
+            'scale': {
+                'users': options['users'],
+                'days': options['days'],
+                'entries_per_day': options['entries_per_day'],
+                'foods': options['foods'],
+                'seed': options['seed'],
+                'cold_cache': options['cold_cache'],
+            },
+            'environment': {
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+            },
+            'seed_seconds': round(seed_seconds, 3),
+            'views': views,
+        }
+
+    def seed(self, options):
+        """Create the catalog, users and entries; return a user and one of their entries"""
+        rng = random.Random(options['seed'])
+
+        Food.objects.bulk_create(
+            (
+                Food(
+                    name=f'Bench Food {i:06d} {rng.choice(["chicken", "rice", "apple", "bread", "cheese"])}',
+                    serving='1 serving',
+                    calories_per_serving=rng.randint(20, 800)
+                )
+                for i in range(options['foods'])
+            ),
+            batch_size=1000
+        )
+        food_ids = list(Food.objects.order_by('id').values_list('id', flat=True))
+
+        users = []
+        for i in range(options['users']):
+            user = User.objects.create_user(f'bench{i}', password='bench-password', is_staff=True)
+            users.append(user)
+            create_entries(user.id, food_ids, options['days'], options['entries_per_day'], options['seed'])
+        refresh_derived_data([user.id for user in users])
+
+        user = users[0]
+        return user, CalorieEntry.objects.filter(user=user).order_by('-date').first()
+
+    def measure(self, client, user, pattern, entry, options):
+        """Time one view; report latency percentiles, queries and peak memory"""
+        kwargs = {}
+        for name in pattern.pattern.converters:
+            if name == 'entry_id' and entry is not None:
+                kwargs[name] = entry.id
+            else:
+                return {'skipped': f'no value for URL parameter {name}'}
+
+        url = reverse(pattern.name, kwargs=kwargs)
+        params = VIEW_PARAMS.get(pattern.name, {})
+
+        def request():
+            if options['cold_cache']:
+                cache.clear()
+            response = client.get(url, params)
+            # Streamed bodies are produced while being read; time that too
+            if response.streaming:
+                b''.join(response.streaming_content)
+            if pattern.name == 'logout':
+                client.force_login(user)
+            return response
+
+        # Warm up once (templates, index, connection) before timing
+        response = request()
+        if response.status_code == 405:
+            # POST-only API: a GET times only the rejection, and a POST
+            # would change the data the other views are measured against
+            return {'skipped': 'does not answer GET'}
+        if not 200 <= response.status_code < 400:
+            raise CommandError(f'{pattern.name} ({url}) answered {response.status_code}')
+
+        timings = []
+        queries = 0
+        for _ in range(max(1, options['iterations'])):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured)
+
+        # Memory in a separate pass: tracing slows the timed requests down
+        tracemalloc.start()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        percentiles = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentiles[18], 3),
+            'queries': queries,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
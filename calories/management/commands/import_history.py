@@ -0,0 +1,54 @@
+import csv
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from calories.importer import IMPORT_BATCH_SIZE, import_history, open_history_file
+
+class Command(BaseCommand):
+    help = 'Import calorie entries for a user from a CSV file (date, food, quantity)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str, help='User to import the entries for')
+        parser.add_argument('file', type=str, help='CSV file, optionally gzipped (.csv.gz)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Entries per bulk insert (default: %d)' % IMPORT_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('User "%s" does not exist' % options['username'])
+
+        if not os.path.exists(options['file']):
+            raise CommandError('CSV file not found at: %s' % options['file'])
+
+        with open(options['file'], 'rb') as file:
+            try:
+                report = import_history(
+                    user,
+                    open_history_file(file, options['file']),
+                    batch_size=max(1, options['batch_size'])
+                )
+            except (ValueError, OSError, csv.Error) as e:
+                raise CommandError(str(e))
+
+        for problem in report['problems']:
+            self.stdout.write(
+                self.style.WARNING(
+                    'Line %d (%s): %s' % (problem['line'], problem['food'], problem['error'])
+                )
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Imported %d entries; %d rows with unknown foods and %d invalid rows skipped' % (
+                    report['created'],
+                    report['unresolved'],
+                    report['invalid'],
+                )
+            )
+        )
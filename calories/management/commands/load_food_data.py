@@ -2,58 +2,135 @@ import csv
 import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import transaction
 from calories.models import Food
+from calories.search import fold_name, invalidate_index
 
 class Command(BaseCommand):
-    help = 'Load food data from CSV file'
+    help = 'Sync food data from CSV file into the catalog without touching calorie entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=None,
+            help='CSV file to load (default: dataset.csv in the project root)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert/update (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing anything',
+        )
 
     def handle(self, *args, **options):
         # Path to the CSV file
-        csv_file_path = os.path.join(settings.BASE_DIR, 'dataset.csv')
-        
+        csv_file_path = options['file'] or os.path.join(settings.BASE_DIR, 'dataset.csv')
+
         if not os.path.exists(csv_file_path):
             self.stdout.write(
                 self.style.ERROR('CSV file not found at: %s' % csv_file_path)
             )
             return
 
-        # Clear existing food data
-        Food.objects.all().delete()
-        self.stdout.write('Cleared existing food data')
-
-        # Load data from CSV
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            foods_created = 0
-            
-            for row in reader:
-                try:
-                    # Extract calories from the string (remove 'cal' and convert to int)
-                    calories_str = row['Calories'].replace(' cal', '').replace(',', '')
-                    calories = int(calories_str)
-                    
-                    # Create food object
-                    food, created = Food.objects.get_or_create(
-                        name=row['Food'].strip(),
-                        defaults={
-                            'serving': row['Serving'].strip(),
-                            'calories_per_serving': calories
-                        }
-                    )
-                    
-                    if created:
-                        foods_created += 1
-                        
-                except (ValueError, KeyError) as e:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            'Skipped row for %s: %s' % (row.get('Food', 'Unknown'), str(e))
-                        )
-                    )
-                    continue
+        self.batch_size = max(1, options['batch_size'])
+        self.dry_run = options['dry_run']
+        self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        self.to_create = []
+        self.to_update = []
+
+        with transaction.atomic():
+            # Existing catalog keyed by normalized name; the oldest row wins
+            # if the catalog already holds duplicates
+            catalog = {}
+            existing = Food.objects.order_by('-id').only('id', 'name', 'serving', 'calories_per_serving')
+            for food in existing.iterator(chunk_size=5000):
+                catalog[fold_name(food.name)] = food
+
+            with open(csv_file_path, 'r', encoding='utf-8') as file:
+                self.sync_rows(csv.DictReader(file), catalog)
+
+            # Entries keep the calories they were logged with, so a price
+            # change leaves history and the daily totals as they were
+            self.flush()
+
+        if not self.dry_run and (self.counts['inserted'] or self.counts['updated']):
+            # Bulk writes bypass the Food signals
+            invalidate_index()
 
+        prefix = 'Dry run: would have ' if self.dry_run else ''
         self.stdout.write(
             self.style.SUCCESS(
-                'Successfully loaded %d food items' % foods_created
+                '%sinserted %d, updated %d, unchanged %d, skipped %d food items' % (
+                    prefix,
+                    self.counts['inserted'],
+                    self.counts['updated'],
+                    self.counts['unchanged'],
+                    self.counts['skipped'],
+                )
             )
-        )
\ No newline at end of file
+        )
+
+    def sync_rows(self, reader, catalog):
+        """Diff each CSV row against the catalog and queue inserts/updates"""
+        seen = set()
+
+        for row in reader:
+            try:
+                # Extract calories from the string (remove 'cal' and convert to int)
+                calories_str = row['Calories'].replace(' cal', '').replace(',', '')
+                calories = int(calories_str)
+                name = row['Food'].strip()
+                serving = row['Serving'].strip()
+            except (ValueError, KeyError, AttributeError) as e:
+                self.counts['skipped'] += 1
+                self.stdout.write(
+                    self.style.WARNING(
+                        'Skipped row for %s: %s' % (row.get('Food', 'Unknown'), str(e))
+                    )
+                )
+                continue
+
+            key = fold_name(name)
+            if not key or key in seen:
+                # First occurrence of a name in the file wins
+                self.counts['skipped'] += 1
+                continue
+            seen.add(key)
+
+            food = catalog.get(key)
+            if food is None:
+                self.to_create.append(Food(name=name, serving=serving, calories_per_serving=calories))
+            elif (food.name, food.serving, food.calories_per_serving) != (name, serving, calories):
+                food.name = name
+                food.serving = serving
+                food.calories_per_serving = calories
+                self.to_update.append(food)
+            else:
+                self.counts['unchanged'] += 1
+
+            if len(self.to_create) >= self.batch_size or len(self.to_update) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Write queued rows in one bulk statement each"""
+        if self.to_create:
+            if not self.dry_run:
+                Food.objects.bulk_create(self.to_create, batch_size=self.batch_size)
+            self.counts['inserted'] += len(self.to_create)
+            self.to_create = []
+
+        if self.to_update:
+            if not self.dry_run:
+                Food.objects.bulk_update(
+                    self.to_update,
+                    ['name', 'serving', 'calories_per_serving'],
+                    batch_size=self.batch_size
+                )
+            self.counts['updated'] += len(self.to_update)
+            self.to_update = []
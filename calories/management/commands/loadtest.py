@@ -0,0 +1,111 @@
+import http.client
+import itertools
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at a running server and report throughput '
+        'and latency, e.g. to compare gunicorn sync workers with ASGI workers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Full URL to request, e.g. http://127.0.0.1:8000/api/search-food/?q=chi')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight (default: 50)')
+        parser.add_argument('--requests', type=int, default=2000, help='Total requests (default: 2000)')
+        parser.add_argument(
+            '--username',
+            type=str,
+            default=None,
+            help='Send the requests as this user (needs the same database as the server)',
+        )
+        parser.add_argument('--output', type=str, default=None, help='Also write the JSON report here')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise CommandError('URL must be absolute, e.g. http://127.0.0.1:8000/api/search-food/?q=chi')
+
+        headers = {'Host': url.netloc}
+        if options['username']:
+            headers['Cookie'] = self.session_cookie(options['username'])
+
+        total = max(1, options['requests'])
+        concurrency = max(1, min(options['concurrency'], total))
+        remaining = itertools.count()
+        lock = threading.Lock()
+        latencies = []
+        statuses = {}
+
+        def worker():
+            """Send requests over one keep-alive connection until the budget is spent"""
+            connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+            conn = connection_class(url.hostname, url.port, timeout=30)
+            path = url.path + ('?' + url.query if url.query else '')
+            while next(remaining) < total:
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path or '/', headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = str(response.status)
+                    if response.getheader('Connection', '').lower() == 'close':
+                        conn.close()
+                except (OSError, http.client.HTTPException) as e:
+                    status = type(e).__name__
+                    conn.close()
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+            conn.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+        elapsed = time.perf_counter() - started
+
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        report = {
+            'url': options['url'],
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'statuses': statuses,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'p99_ms': round(percentiles[98], 2),
+        }
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def session_cookie(self, username):
+        """Log ``username`` in by writing a session row the server will accept"""
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError('User "%s" does not exist' % username)
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from calories.models import DailyTotal
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyTotal rollup from calorie entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            type=str,
+            action='append',
+            help='Only rebuild totals for this user (can be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per insert batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['username']:
+            user_ids = list(
+                User.objects.filter(username__in=options['username']).values_list('id', flat=True)
+            )
+            if not user_ids:
+                self.stdout.write(self.style.WARNING('No matching users found'))
+                return
+
+        written = DailyTotal.objects.rebuild(user_ids=user_ids, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS('Rebuilt %d daily total rows' % written)
+        )
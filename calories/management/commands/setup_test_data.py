@@ -1,8 +1,85 @@
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+from multiprocessing import get_context
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from calories.models import Food, UserProfile, CalorieEntry
+from django.db import connection, connections, transaction
+from calories.models import Food, UserProfile, CalorieEntry, DailyTotal
+
+
+def generate_entries(user_id, food_ids, days, entries_per_day=None, seed=0, today=None):
+    """
+    Yield unsaved entries for ``days`` days ending ``today``.
+
+    The random stream is seeded per user, so a user's history depends only
+    on the seed, the catalog and the user id -- not on how many other users
+    are generated, in which order, or by which worker process.
+    """
+    rng = random.Random(f'{seed}:{user_id}')
+    today = today or date.today()
+
+    for days_back in range(days):
+        entry_date = today - timedelta(days=days_back)
+        # 2-5 random entries per day unless a fixed count is requested
+        count = entries_per_day if entries_per_day is not None else rng.randint(2, 5)
+        # Sample without replacement: one entry per food per day
+        for food_id in rng.sample(food_ids, min(count, len(food_ids))):
+            yield CalorieEntry(
+                user_id=user_id,
+                food_id=food_id,
+                quantity=Decimal(str(round(rng.uniform(0.5, 2.5), 1))),
+                date=entry_date
+            )
+
+
+def create_entries(user_id, food_ids, days, entries_per_day=None, seed=0, today=None, batch_size=5000):
+    """
+    Insert a user's generated entries in ``batch_size`` chunks, skipping
+    food/day pairs the user already logged. Returns the number created.
+    """
+    today = today or date.today()
+    existing = set(
+        CalorieEntry.objects.filter(
+            user_id=user_id,
+            date__gt=today - timedelta(days=days),
+            date__lte=today
+        ).values_list('food_id', 'date')
+    )
+
+    created = 0
+    batch = []
+    for entry in generate_entries(user_id, food_ids, days, entries_per_day, seed, today):
+        if (entry.food_id, entry.date) in existing:
+            continue
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                CalorieEntry.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            CalorieEntry.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def refresh_derived_data(user_ids, chunk_size=500):
+    """
+    Rebuild the rollup and streaks of users whose entries were written with
+    ``bulk_create``, which bypasses the signals that normally maintain them
+    """
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        DailyTotal.objects.rebuild(user_ids=chunk)
+        for profile in UserProfile.objects.filter(user_id__in=chunk):
+            profile.refresh_streak()
+
 
 class Command(BaseCommand):
     help = 'Set up test data for CalorieTracker application'
@@ -30,6 +107,42 @@ class Command(BaseCommand):
             default='testpass123',
             help='Password for test user (default: testpass123)',
         )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=0,
+            help='Generate this many extra users (<username>1..N) with entries',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Days of history to generate per user (default: 7)',
+        )
+        parser.add_argument(
+            '--entries-per-day',
+            type=int,
+            default=None,
+            help='Entries per user per day (default: random 2-5)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed; the same seed and catalog give the same data',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert (default: 5000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes generating entries (default: 1)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -48,6 +161,15 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Found {food_count} food items in database')
 
+        self.food_ids = list(Food.objects.order_by('id').values_list('id', flat=True))
+        self.days = max(0, options['days'])
+        self.entries_per_day = options['entries_per_day']
+        self.batch_size = max(1, options['batch_size'])
+        self.seed = options['seed']
+        if self.seed is None:
+            self.seed = random.randrange(2 ** 32)
+            self.stdout.write(f'Using random seed {self.seed}')
+
         # Create test user if requested
         if options['create_user']:
             username = options['username']
@@ -86,47 +208,86 @@ class Command(BaseCommand):
             if options['create_entries']:
                 self.create_sample_entries(user)
 
+        if options['users'] > 0:
+            self.create_load_users(options)
+
         # Display summary
         self.display_summary()
 
     def create_sample_entries(self, user):
         """Create sample calorie entries for the past week"""
         self.stdout.write('Creating sample calorie entries...')
-        
-        # Get random food items
-        foods = list(Food.objects.all()[:50])  # Use first 50 foods
-        entries_created = 0
-        
-        # Create entries for the past 7 days
-        for days_back in range(7):
-            entry_date = date.today() - timedelta(days=days_back)
-            
-            # Create 2-5 random entries per day
-            daily_entries = random.randint(2, 5)
-            
-            for _ in range(daily_entries):
-                # Select random food and quantity
-                food = random.choice(foods)
-                quantity = round(random.uniform(0.5, 2.5), 1)
-                
-                # Check if entry already exists to avoid duplicates
-                if not CalorieEntry.objects.filter(
-                    user=user, 
-                    food=food, 
-                    date=entry_date
-                ).exists():
-                    CalorieEntry.objects.create(
-                        user=user,
-                        food=food,
-                        quantity=quantity,
-                        date=entry_date
-                    )
-                    entries_created += 1
+
+        entries_created = create_entries(
+            user.id,
+            self.food_ids,
+            self.days,
+            self.entries_per_day,
+            self.seed,
+            batch_size=self.batch_size
+        )
+        refresh_derived_data([user.id])
 
         self.stdout.write(
             self.style.SUCCESS(f'Created {entries_created} sample entries')
         )
 
+    def create_load_users(self, options):
+        """Create ``--users`` users and their history in bulk"""
+        prefix = options['username']
+        usernames = [f'{prefix}{i}' for i in range(1, options['users'] + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+        # Hashing is deliberately slow, so every generated user shares one hash
+        password = make_password(options['password'])
+        User.objects.bulk_create(
+            [User(username=name, password=password, email=f'{name}@example.com')
+             for name in usernames if name not in existing],
+            batch_size=self.batch_size
+        )
+        user_ids = list(User.objects.filter(username__in=usernames).order_by('id').values_list('id', flat=True))
+
+        # bulk_create skips the signal that creates profiles
+        with_profile = set(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=user_id, daily_calorie_goal=2200)
+             for user_id in user_ids if user_id not in with_profile],
+            batch_size=self.batch_size
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {len(usernames) - len(existing)} users')
+        )
+
+        create = partial(
+            create_entries,
+            food_ids=self.food_ids,
+            days=self.days,
+            entries_per_day=self.entries_per_day,
+            seed=self.seed,
+            today=date.today(),
+            batch_size=self.batch_size
+        )
+
+        workers = max(1, options['workers'])
+        if workers > 1 and connection.vendor == 'sqlite':
+            # SQLite serialises writers; parallel inserts only add lock waits
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using 1 worker'))
+            workers = 1
+
+        if workers > 1:
+            # Forked children must open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=get_context('fork')) as pool:
+                entries_created = sum(pool.map(create, user_ids, chunksize=max(1, len(user_ids) // (workers * 4))))
+        else:
+            entries_created = sum(create(user_id) for user_id in user_ids)
+
+        refresh_derived_data(user_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {entries_created} entries for {len(user_ids)} users')
+        )
+
     def display_summary(self):
         """Display a summary of the current data"""
         self.stdout.write('\n' + '='*50)
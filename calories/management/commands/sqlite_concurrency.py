@@ -0,0 +1,160 @@
+import copy
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from calories.models import CalorieEntry, DailyTotal, Food
+
+PROFILES = ('default', 'tuned')
+
+
+def run_worker(user_id, food_ids, start_at, seconds, write_ratio, seed):
+    """
+    Mix the dashboard's reads with ``add_calorie_entry``'s write from one
+    process until ``seconds`` have passed; return latencies and errors
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    latencies = {'read': [], 'write': []}
+    errors = {}
+
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        kind = 'write' if rng.random() < write_ratio else 'read'
+        started = time.perf_counter()
+        try:
+            if kind == 'write':
+                # The entry's post_save refreshes the rollup and streak in
+                # the same transaction: a read followed by writes
+                with transaction.atomic():
+                    CalorieEntry.objects.create(
+                        user_id=user_id,
+                        food_id=rng.choice(food_ids),
+                        date=today - timedelta(days=rng.randrange(7))
+                    )
+            else:
+                DailyTotal.objects.daily_totals(user_id, today - timedelta(days=6), today)
+                list(CalorieEntry.objects.filter(user_id=user_id).select_related('food')[:10])
+        except OperationalError as e:
+            errors[str(e)] = errors.get(str(e), 0) + 1
+            continue
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    connections.close_all()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Run reads and writes against a scratch SQLite file from several '
+        'processes at once, with the default and the tuned (SQLITE_TUNED) '
+        'connection profile, and report throughput, latency and lock errors'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Concurrent processes (default: 4)')
+        parser.add_argument('--seconds', type=float, default=5, help='Run time per profile (default: 5)')
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.2,
+            help='Fraction of operations that write (default: 0.2)',
+        )
+        parser.add_argument('--profile', choices=[*PROFILES, 'both'], default='both', help='Profile(s) to run')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--output', type=str, default=None, help='Also write the JSON report here')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark needs the SQLite backend')
+
+        profiles = PROFILES if options['profile'] == 'both' else [options['profile']]
+        report = {
+            'processes': max(1, options['processes']),
+            'seconds': options['seconds'],
+            'write_ratio': options['write_ratio'],
+            'profiles': {},
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                report['profiles'][profile] = self.run_profile(profile, path, options)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def run_profile(self, profile, path, options):
+        """Point the default connection at ``path`` with ``profile``'s settings and run the workers"""
+        connections.close_all()
+        saved = copy.deepcopy(connection.settings_dict)
+        connection.settings_dict.update({
+            'NAME': path,
+            'OPTIONS': dict(settings.SQLITE_TUNED_OPTIONS) if profile == 'tuned' else {},
+            'CONN_MAX_AGE': settings.SQLITE_TUNED_CONN_MAX_AGE if profile == 'tuned' else 0,
+        })
+        try:
+            call_command('migrate', verbosity=0, interactive=False)
+            user_ids, food_ids = self.seed(options)
+
+            # Forked children must open their own connections
+            connections.close_all()
+            processes = max(1, options['processes'])
+            start_at = time.time() + 0.5
+            with ProcessPoolExecutor(processes, mp_context=get_context('fork')) as pool:
+                results = list(pool.map(
+                    run_worker,
+                    [user_ids[i % len(user_ids)] for i in range(processes)],
+                    [food_ids] * processes,
+                    [start_at] * processes,
+                    [options['seconds']] * processes,
+                    [options['write_ratio']] * processes,
+                    [options['seed'] + i for i in range(processes)],
+                ))
+            journal_mode = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+        finally:
+            connections.close_all()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(saved)
+
+        summary = {'journal_mode': journal_mode, 'errors': {}}
+        for kind in ('read', 'write'):
+            latencies = [ms for result, _ in results for ms in result[kind]]
+            percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            summary[kind] = {
+                'operations': len(latencies),
+                'per_second': round(len(latencies) / options['seconds'], 1),
+                'p50_ms': round(percentiles[49], 2) if latencies else None,
+                'p95_ms': round(percentiles[94], 2) if latencies else None,
+            }
+        for _, errors in results:
+            for message, count in errors.items():
+                summary['errors'][message] = summary['errors'].get(message, 0) + count
+        return summary
+
+    def seed(self, options):
+        """A small catalog and one user per process"""
+        Food.objects.bulk_create(
+            Food(name=f'Concurrency Food {i}', serving='1 serving', calories_per_serving=100 + i)
+            for i in range(50)
+        )
+        users = [
+            User.objects.create_user(f'concurrency{i}', password='concurrency-password')
+            for i in range(max(1, options['processes']))
+        ]
+        return [user.id for user in users], list(Food.objects.values_list('id', flat=True))
@@ -0,0 +1,209 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .routers import PIN_SESSION_KEY, pin_until, replica_aliases
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts queries and their wall time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestTiming:
+    """Timestamps collected for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.render_started = None
+        self.render_finished = None
+        self.queries = QueryRecorder()
+
+    def metrics(self, finished):
+        """Return ``{name: milliseconds}`` for the phases that ran"""
+        metrics = {
+            'total': finished - self.started,
+            'db': self.queries.seconds,
+        }
+        if self.view_started is not None:
+            metrics['view'] = (self.render_started or finished) - self.view_started
+        if self.render_started is not None and self.render_finished is not None:
+            metrics['render'] = self.render_finished - self.render_started
+        return {name: round(seconds * 1000, 2) for name, seconds in metrics.items()}
+
+
+class RequestTimingMiddleware:
+    """
+    Record query count, DB time, view time and template render time for a
+    sample of requests. The numbers go out in a ``Server-Timing`` header,
+    which browser dev tools display, and in a ``request_timing`` log line:
+    at INFO normally and at WARNING once the request is slower than
+    ``REQUEST_TIMING_SLOW_MS``.
+
+    Render time is only separated from view time for views that return a
+    ``TemplateResponse``; for others it is part of the view time.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The hooks only read the clock; run them on the event loop
+            # instead of letting Django wrap each in a thread hop
+            self.process_view = self._aprocess_view
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if not self.sampled():
+            return self.get_response(request)
+
+        timing = request._request_timing = RequestTiming()
+        with self.recording(timing):
+            response = self.get_response(request)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        timing = request._request_timing = RequestTiming()
+        # Connections are thread-local and the async ORM runs queries in the
+        # request's sync thread, so install the wrappers from that thread
+        recording = await sync_to_async(self.recording)(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        return self.finish(request, response, timing)
+
+    def sampled(self):
+        return random.random() < getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0.01)
+
+    def recording(self, timing):
+        """
+        Start feeding every query on this thread to ``timing``; closing the
+        returned stack stops it
+        """
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timing.queries))
+        return stack
+
+    def finish(self, request, response, timing):
+        metrics = timing.metrics(time.perf_counter())
+        response['Server-Timing'] = ', '.join(
+            [f'db;dur={metrics["db"]};desc="{timing.queries.count} queries"'] +
+            [f'{name};dur={metrics[name]}' for name in ('view', 'render', 'total') if name in metrics]
+        )
+        self.log(request, response, timing, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view(request)
+
+    def process_template_response(self, request, response):
+        return self.start_render(request, response)
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view(request)
+
+    async def _aprocess_template_response(self, request, response):
+        return self.start_render(request, response)
+
+    def start_view(self, request):
+        timing = getattr(request, '_request_timing', None)
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def start_render(self, request, response):
+        timing = getattr(request, '_request_timing', None)
+        if timing is not None:
+            # Runs after every other middleware's hook, right before render
+            timing.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: setattr(timing, 'render_finished', time.perf_counter())
+            )
+        return response
+
+    def log(self, request, response, timing, metrics):
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timing.queries.count,
+            **{f'{name}_ms': value for name, value in metrics.items()},
+        }
+        slow = metrics['total'] >= getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            'request_timing ' + ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'request_timing': fields}
+        )
+
+
+class PrimaryPinMiddleware:
+    """
+    After a request that may have written (anything but GET, HEAD, OPTIONS
+    and TRACE), record in the session that the user's reads stay on the
+    primary for REPLICA_PIN_SECONDS, so ``read_from_replica`` views show
+    their own writes while the replicas catch up. Does nothing when no
+    DATABASE_REPLICAS are configured. Goes after SessionMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.pins(request):
+            request.session[PIN_SESSION_KEY] = pin_until()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.pins(request):
+            await request.session.aset(PIN_SESSION_KEY, pin_until())
+        return response
+
+    def pins(self, request):
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and
+            bool(replica_aliases()) and
+            # Not for visitors without a session, or one just flushed by logout
+            hasattr(request, 'session') and
+            not request.session.is_empty()
+        )
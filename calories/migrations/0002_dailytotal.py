@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_daily_totals(apps, schema_editor):
+    CalorieEntry = apps.get_model("calories", "CalorieEntry")
+    DailyTotal = apps.get_model("calories", "DailyTotal")
+
+    rows = (
+        CalorieEntry.objects.order_by()
+        .values("user_id", "date")
+        .annotate(
+            calories=Sum(
+                ExpressionWrapper(
+                    F("food__calories_per_serving") * F("quantity"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )
+            ),
+            entry_count=Count("id"),
+        )
+    )
+    DailyTotal.objects.bulk_create(
+        (
+            DailyTotal(
+                user_id=row["user_id"],
+                date=row["date"],
+                calories=int(row["calories"] or 0),
+                entry_count=row["entry_count"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calories", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("calories", models.IntegerField(default=0)),
+                ("entry_count", models.PositiveIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "date"), name="unique_daily_total"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_daily_totals, migrations.RunPython.noop),
+    ]
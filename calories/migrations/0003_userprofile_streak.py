@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:55
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_streaks(apps, schema_editor):
+    UserProfile = apps.get_model("calories", "UserProfile")
+    DailyTotal = apps.get_model("calories", "DailyTotal")
+
+    for profile in UserProfile.objects.iterator():
+        goal = profile.daily_calorie_goal
+        dates = list(
+            DailyTotal.objects.filter(
+                user_id=profile.user_id,
+                calories__gte=goal * 0.8,
+                calories__lte=goal * 1.2,
+            )
+            .order_by("-date")
+            .values_list("date", flat=True)[:365]
+        )
+        if not dates:
+            continue
+
+        streak = 1
+        for later, earlier in zip(dates, dates[1:]):
+            if later - earlier != timedelta(days=1):
+                break
+            streak += 1
+        UserProfile.objects.filter(pk=profile.pk).update(
+            current_streak=streak, streak_last_date=dates[0]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calories", "0002_dailytotal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="current_streak",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="streak_last_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_streaks, migrations.RunPython.noop),
+    ]
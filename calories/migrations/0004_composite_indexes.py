@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calories", "0003_userprofile_streak"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="calorieentry",
+            index=models.Index(
+                fields=["user", "-date", "-time_added", "-id"],
+                name="entry_user_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="food",
+            index=models.Index(fields=["name"], name="food_name_idx"),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Cast, Floor
+
+
+def backfill_entry_calories(apps, schema_editor):
+    CalorieEntry = apps.get_model("calories", "CalorieEntry")
+    Food = apps.get_model("calories", "Food")
+    DailyTotal = apps.get_model("calories", "DailyTotal")
+
+    # One UPDATE pricing every entry at today's catalog, truncated like the
+    # old per-row property
+    price = Subquery(
+        Food.objects.filter(pk=OuterRef("food_id")).values("calories_per_serving")[:1]
+    )
+    CalorieEntry.objects.update(
+        calories=Cast(
+            Floor(
+                ExpressionWrapper(
+                    price * F("quantity"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )
+            ),
+            IntegerField(),
+        )
+    )
+
+    # Day totals are now sums of the truncated entry values
+    DailyTotal.objects.all().delete()
+    rows = (
+        CalorieEntry.objects.order_by()
+        .values("user_id", "date")
+        .annotate(calories=Sum("calories"), entry_count=Count("id"))
+    )
+    DailyTotal.objects.bulk_create(
+        (
+            DailyTotal(
+                user_id=row["user_id"],
+                date=row["date"],
+                calories=row["calories"] or 0,
+                entry_count=row["entry_count"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calories", "0004_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="calorieentry",
+            name="calories",
+            field=models.IntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_entry_calories, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="calorieentry",
+            index=models.Index(
+                fields=["user", "date", "calories"], name="entry_user_date_cal_idx"
+            ),
+        ),
+    ]
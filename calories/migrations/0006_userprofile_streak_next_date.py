@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:00
+
+from datetime import date, timedelta
+
+from django.db import migrations, models
+
+
+def recompute_streaks(apps, schema_editor):
+    """
+    Stop stored runs at today and note each user's first goal-meeting day
+    after it; earlier code let a future-dated day end the run
+    """
+    UserProfile = apps.get_model("calories", "UserProfile")
+    DailyTotal = apps.get_model("calories", "DailyTotal")
+    today = date.today()
+
+    for profile in UserProfile.objects.iterator():
+        goal = profile.daily_calorie_goal
+        days = DailyTotal.objects.filter(
+            user_id=profile.user_id,
+            calories__gte=goal * 0.8,
+            calories__lte=goal * 1.2,
+        )
+        dates = list(
+            days.filter(date__lte=today)
+            .order_by("-date")
+            .values_list("date", flat=True)[:365]
+        )
+        streak = 1 if dates else 0
+        for later, earlier in zip(dates, dates[1:]):
+            if later - earlier != timedelta(days=1):
+                break
+            streak += 1
+        UserProfile.objects.filter(pk=profile.pk).update(
+            current_streak=streak,
+            streak_last_date=dates[0] if dates else None,
+            streak_next_date=days.filter(date__gt=today)
+            .order_by("date")
+            .values_list("date", flat=True)
+            .first(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calories", "0005_calorieentry_calories"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="streak_next_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(recompute_streaks, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+from datetime import date, datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -13,16 +18,193 @@ class Food(models.Model):
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Catalog listing/sorting (default ordering, admin) and exact
+            # name lookups
+            models.Index(fields=['name'], name='food_name_idx'),
+        ]
 
 class UserProfile(models.Model):
     """Extended user profile for additional information"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     daily_calorie_goal = models.IntegerField(default=2000)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Run of consecutive goal-meeting days ending at streak_last_date, the
+    # latest day up to today that met the goal. Maintained from DailyTotal
+    # changes. Future-dated days do not count yet: streak_next_date holds the
+    # earliest one that met the goal, folded in once it is reached.
+    current_streak = models.PositiveIntegerField(default=0)
+    streak_last_date = models.DateField(null=True, blank=True)
+    streak_next_date = models.DateField(null=True, blank=True)
+    
+    STREAK_MAX_DAYS = 365
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded goal so a change can trigger a streak recompute
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def meets_goal(self, calories):
+        """A day counts toward the streak when within 80-120% of the goal"""
+        goal = self.daily_calorie_goal
+        return goal * 0.8 <= calories <= goal * 1.2
+    
+    def streak_on(self, day):
+        """
+        The streak as seen on ``day``; 0 unless the run reaches it. Folds in
+        a future-dated goal-meeting day once ``day`` has reached it.
+        """
+        if self.streak_next_date is not None and self.streak_next_date <= day:
+            self.refresh_streak(day)
+        return self.current_streak if self.streak_last_date == day else 0
+    
+    async def astreak_on(self, day):
+        """Async ``streak_on``"""
+        if self.streak_next_date is not None and self.streak_next_date <= day:
+            await sync_to_async(self.refresh_streak)(day)
+        return self.streak_on(day)
+    
+    def refresh_streak(self, today=None):
+        """Recompute and store the streak as of ``today`` (default today)"""
+        today = today or date.today()
+        self.save_streak(*self.compute_streak(end=today), self.next_goal_day(today))
+    
+    def goal_days(self):
+        goal = self.daily_calorie_goal
+        return DailyTotal.objects.filter(
+            user_id=self.user_id,
+            calories__gte=goal * 0.8,
+            calories__lte=goal * 1.2
+        )
+    
+    def next_goal_day(self, after):
+        """The first goal-meeting day after ``after``, or None"""
+        return self.goal_days().filter(date__gt=after).order_by('date').values_list('date', flat=True).first()
+    
+    def compute_streak(self, end=None):
+        """
+        Return ``(length, last_date)`` of the run of goal-meeting days ending
+        at the latest such day on or before ``end`` (default today), from
+        one query over the rollup
+        """
+        if end is None:
+            end = date.today()
+        days = self.goal_days().filter(date__lte=end)
+        dates = list(days.order_by('-date').values_list('date', flat=True)[:self.STREAK_MAX_DAYS])
+        
+        if not dates:
+            return 0, None
+        
+        streak = 1
+        for later, earlier in zip(dates, dates[1:]):
+            if later - earlier != timedelta(days=1):
+                break
+            streak += 1
+        return streak, dates[0]
+    
+    def update_streak(self, day_totals):
+        """
+        Apply changed ``{date: calories}`` totals to the stored streak.
+        Days after the current run extend or restart it without a query;
+        anything touching the run itself falls back to ``refresh_streak``.
+        Goal-meeting days after today are noted in ``streak_next_date``.
+        """
+        today = date.today()
+        streak, last_date, next_date = self.current_streak, self.streak_last_date, self.streak_next_date
+        if next_date is not None and next_date <= today:
+            # A noted future day has arrived; extend from the whole history
+            self.refresh_streak(today)
+            return
+        for day in sorted(day_totals):
+            if last_date is not None and day <= last_date:
+                self.refresh_streak(today)
+                return
+            if not self.meets_goal(day_totals[day]):
+                continue
+            if day > today:
+                next_date = day if next_date is None else min(next_date, day)
+            elif last_date is not None and day == last_date + timedelta(days=1):
+                streak, last_date = min(streak + 1, self.STREAK_MAX_DAYS), day
+            else:
+                streak, last_date = 1, day
+        self.save_streak(streak, last_date, next_date)
+    
+    def save_streak(self, streak, last_date, next_date):
+        """Store the streak without sending save signals"""
+        if (streak, last_date, next_date) == (self.current_streak, self.streak_last_date, self.streak_next_date):
+            return
+        self.current_streak, self.streak_last_date, self.streak_next_date = streak, last_date, next_date
+        UserProfile.objects.filter(pk=self.pk).update(
+            current_streak=streak,
+            streak_last_date=last_date,
+            streak_next_date=next_date
+        )
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+def fill_days(totals, start, end):
+    """
+    Expand ``{date: calories}`` to every day from ``start`` to ``end``
+    inclusive, in date order, with zeros for missing days
+    """
+    days = (end - start).days + 1
+    return {
+        start + timedelta(days=i): totals.get(start + timedelta(days=i), 0)
+        for i in range(days)
+    }
+
+class CalorieEntryQuerySet(models.QuerySet):
+    """Aggregations over calorie entries"""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        ``bulk_create`` that fills in the calories snapshot, which ``save()``
+        would otherwise compute, looking up in one query the prices of foods
+        that are not already loaded on the entries
+        """
+        objs = list(objs)
+        missing = [entry for entry in objs if entry.calories is None]
+        unloaded = {
+            entry.food_id for entry in missing
+            if not CalorieEntry.food.is_cached(entry)
+        }
+        prices = dict(
+            Food.objects.filter(pk__in=unloaded).values_list('id', 'calories_per_serving')
+        ) if unloaded else {}
+        for entry in missing:
+            price = (
+                entry.food.calories_per_serving
+                if CalorieEntry.food.is_cached(entry)
+                else prices[entry.food_id]
+            )
+            entry.calories = CalorieEntry.calories_for(price, entry.quantity)
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def per_day(self):
+        """
+        Group by user and date with summed ``calories`` and ``entry_count``
+        per group, from the entry table alone
+        """
+        return self.order_by().values('user_id', 'date').annotate(
+            calories=Sum('calories'),
+            entry_count=Count('id')
+        )
+    
+    def daily_totals(self, user, start, end):
+        """
+        Return ``{date: calories}`` for ``user`` from ``start`` to ``end``
+        inclusive using a single grouped query; days without entries are 0
+        """
+        rows = self.filter(
+            user=user,
+            date__range=[start, end]
+        ).per_day()
+        totals = {row['date']: int(row['calories'] or 0) for row in rows}
+        return fill_days(totals, start, end)
+
 class CalorieEntry(models.Model):
     """Model to track daily calorie intake"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -30,13 +212,211 @@ class CalorieEntry(models.Model):
     quantity = models.DecimalField(max_digits=5, decimal_places=2, default=1.0)
     date = models.DateField(default=timezone.now)
     time_added = models.DateTimeField(auto_now_add=True)
+    # Calories at the food's price when logged, so aggregates need no join
+    # and later catalog changes leave history alone. Set by save() and
+    # bulk_create().
+    calories = models.IntegerField(editable=False)
+    
+    objects = CalorieEntryQuerySet.as_manager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the entry lived so an edit that moves it to another
+        # day can refresh the rollup for the day it left
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    @staticmethod
+    def calories_for(calories_per_serving, quantity):
+        """Calories of ``quantity`` servings, truncated to a whole number"""
+        return int(calories_per_serving * quantity)
+    
+    def save(self, *args, **kwargs):
+        # Re-price only when the food or quantity changed, so other edits
+        # keep the snapshot taken when the entry was logged
+        loaded = getattr(self, '_loaded_values', {})
+        if (
+            self.calories is None
+            or loaded.get('food_id') != self.food_id
+            or loaded.get('quantity') != self.quantity
+        ):
+            self.calories = self.calories_for(self.food.calories_per_serving, self.quantity)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'calories'}
+        super().save(*args, **kwargs)
     
     @property
     def total_calories(self):
-        return int(self.food.calories_per_serving * self.quantity)
+        return self.calories
     
     def __str__(self):
         return f"{self.user.username} - {self.food.name} - {self.total_calories} cal"
     
     class Meta:
-        ordering = ['-time_added']
\ No newline at end of file
+        ordering = ['-time_added']
+        indexes = [
+            # Every hot read filters one user's entries by a date or date
+            # range; history pages walk them newest first by this exact key.
+            # Its (user, date) prefix serves the per-day and range filters.
+            models.Index(
+                fields=['user', '-date', '-time_added', '-id'],
+                name='entry_user_recent_idx'
+            ),
+            # Covers per-day sums, so the rollup refresh reads only the index
+            models.Index(
+                fields=['user', 'date', 'calories'],
+                name='entry_user_date_cal_idx'
+            ),
+        ]
+
+
+class DailyTotalManager(models.Manager):
+    """Maintains and reads the per-user daily calorie rollup"""
+    
+    def refresh(self, user_id, dates):
+        """
+        Recompute the rollup rows for ``user_id`` on ``dates`` from
+        CalorieEntry in one grouped query and upsert them in one statement.
+        The user's profile row is locked first so concurrent writers for the
+        same user serialize and the last one always sees every entry.
+        Returns the new ``{date: calories}`` for the refreshed dates.
+        """
+        # A fresh entry may still carry the datetime from its field default
+        dates = {d.date() if isinstance(d, datetime) else d for d in dates}
+        if not dates:
+            return {}
+        
+        with transaction.atomic():
+            UserProfile.objects.select_for_update().filter(user_id=user_id).first()
+            
+            rows = CalorieEntry.objects.filter(
+                user_id=user_id,
+                date__in=dates
+            ).per_day()
+            totals = [
+                self.model(
+                    user_id=user_id,
+                    date=row['date'],
+                    calories=int(row['calories'] or 0),
+                    entry_count=row['entry_count']
+                )
+                for row in rows
+            ]
+            
+            emptied = dates - {total.date for total in totals}
+            if emptied:
+                self.filter(user_id=user_id, date__in=emptied).delete()
+            if totals:
+                self.bulk_create(
+                    totals,
+                    update_conflicts=True,
+                    unique_fields=['user', 'date'],
+                    update_fields=['calories', 'entry_count']
+                )
+        
+        changed = dict.fromkeys(emptied, 0)
+        changed.update((total.date, total.calories) for total in totals)
+        return changed
+    
+    def rebuild(self, user_ids=None, batch_size=1000):
+        """
+        Rebuild the rollup from scratch, for every user or only ``user_ids``.
+        Returns the number of rows written.
+        """
+        entries = CalorieEntry.objects.order_by()
+        existing = self.all()
+        if user_ids is not None:
+            entries = entries.filter(user_id__in=user_ids)
+            existing = existing.filter(user_id__in=user_ids)
+        
+        rows = entries.per_day()
+        
+        written = 0
+        with transaction.atomic():
+            existing.delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(self.model(
+                    user_id=row['user_id'],
+                    date=row['date'],
+                    calories=int(row['calories'] or 0),
+                    entry_count=row['entry_count']
+                ))
+                if len(batch) >= batch_size:
+                    self.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                self.bulk_create(batch)
+                written += len(batch)
+        return written
+    
+    def daily_totals(self, user, start, end):
+        """
+        Same contract as ``CalorieEntry.objects.daily_totals`` but read
+        from the rollup, so the cost does not grow with entries per day
+        """
+        totals = dict(self.filter(
+            user=user,
+            date__range=[start, end]
+        ).values_list('date', 'calories'))
+        return fill_days(totals, start, end)
+    
+    async def adaily_totals(self, user, start, end):
+        """Async ``daily_totals``"""
+        rows = self.filter(
+            user=user,
+            date__range=[start, end]
+        ).values_list('date', 'calories')
+        return fill_days({day: calories async for day, calories in rows}, start, end)
+    
+    def monthly_totals(self, user, start, end):
+        """
+        Return ``{month: {'calories', 'days_logged', 'entry_count'}}`` for
+        ``user`` from ``start`` to ``end`` inclusive, keyed by the first of
+        each month and grouped in the database; months without entries are
+        left out
+        """
+        rows = self.filter(
+            user=user,
+            date__range=[start, end]
+        ).order_by().annotate(month=TruncMonth('date')).values('month').annotate(
+            total=Sum('calories'),
+            days_logged=Count('id'),
+            entries=Sum('entry_count')
+        )
+        return {
+            row['month']: {
+                'calories': row['total'] or 0,
+                'days_logged': row['days_logged'],
+                'entry_count': row['entries'] or 0,
+            }
+            for row in rows
+        }
+    
+    def total_between(self, user, start, end):
+        """Sum of calories from ``start`` to ``end`` inclusive"""
+        total = self.filter(
+            user=user,
+            date__range=[start, end]
+        ).aggregate(total=Sum('calories'))['total']
+        return total or 0
+
+class DailyTotal(models.Model):
+    """Materialized per-user daily calorie totals, maintained on write"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    calories = models.IntegerField(default=0)
+    entry_count = models.PositiveIntegerField(default=0)
+    
+    objects = DailyTotalManager()
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date} - {self.calories} cal"
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_total')
+        ]
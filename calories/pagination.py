@@ -0,0 +1,127 @@
+from datetime import date, datetime
+from functools import reduce
+from operator import or_
+
+from django.core import signing
+from django.db.models import Q
+
+_SALT = 'calories.pagination'
+
+
+class KeysetPage:
+    """A page of results plus opaque cursors for its neighbours"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode(value, field):
+    internal = field.get_internal_type()
+    if internal == 'DateTimeField':
+        return datetime.fromisoformat(value)
+    if internal == 'DateField':
+        return date.fromisoformat(value)
+    return field.to_python(value)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered descending by ``keys``.
+
+    Each page is a single ``WHERE key < cursor ORDER BY key LIMIT n+1``
+    query, so page N costs the same as page 1: there is no ``COUNT(*)`` and
+    no ``OFFSET`` scan. The last key must be unique (e.g. ``id``). Cursors
+    are signed, so clients cannot forge arbitrary filters.
+    """
+
+    def __init__(self, queryset, keys, per_page):
+        self.queryset = queryset
+        self.keys = keys
+        self.per_page = per_page
+        self.fields = [queryset.model._meta.get_field(key) for key in keys]
+
+    def _cursor(self, item, direction):
+        values = [_encode(getattr(item, field.attname)) for field in self.fields]
+        return signing.dumps([direction, values], salt=_SALT, compress=True)
+
+    def _parse(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=_SALT)
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                return None
+            return direction, [_decode(v, f) for v, f in zip(values, self.fields)]
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+
+    def _beyond(self, values, lookup):
+        """Rows strictly past ``values`` in lexicographic key order"""
+        clauses = []
+        for i, key in enumerate(self.keys):
+            equal = {k: v for k, v in zip(self.keys[:i], values[:i])}
+            clauses.append(Q(**equal, **{f'{key}__{lookup}': values[i]}))
+        # The redundant bound on the leading key lets the database use a
+        # range scan on the index instead of evaluating the OR per row
+        inclusive = {'lt': 'lte', 'gt': 'gte'}[lookup]
+        leading = Q(**{f'{self.keys[0]}__{inclusive}': values[0]})
+        return leading & reduce(or_, clauses)
+
+    def get_page(self, cursor=None):
+        """Return the page after/before ``cursor``, or the first page"""
+        parsed = self._parse(cursor) if cursor else None
+        descending = [f'-{key}' for key in self.keys]
+
+        if parsed is None:
+            rows = list(self.queryset.order_by(*descending)[:self.per_page + 1])
+            items = rows[:self.per_page]
+            has_more, has_previous = len(rows) > self.per_page, False
+        elif parsed[0] == 'next':
+            rows = list(self.queryset.filter(
+                self._beyond(parsed[1], 'lt')
+            ).order_by(*descending)[:self.per_page + 1])
+            items = rows[:self.per_page]
+            has_more, has_previous = len(rows) > self.per_page, True
+        else:
+            rows = list(self.queryset.filter(
+                self._beyond(parsed[1], 'gt')
+            ).order_by(*self.keys)[:self.per_page + 1])
+            items = rows[:self.per_page][::-1]
+            has_previous, has_more = len(rows) > self.per_page, True
+
+        if not items:
+            # A stale cursor past the end (e.g. rows deleted since) falls
+            # back to the first page
+            return self.get_page() if parsed else KeysetPage(items)
+        return KeysetPage(
+            items,
+            next_cursor=self._cursor(items[-1], 'next') if has_more else None,
+            previous_cursor=self._cursor(items[0], 'prev') if has_previous else None
+        )
@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta
+from heapq import nlargest
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .cache import LRUCache, record_outcome
+from .models import CalorieEntry
+
+# Foods returned in each of the recent and frequent lists
+RECENT_FOODS_LIMIT = 8
+
+# Per-user food usage, ``{user_id: {food_id: usage}}``. Per process, like the
+# search index: other workers see a change once their copy expires.
+_usage_cache = LRUCache(
+    getattr(settings, 'RECENT_FOODS_CACHE_SIZE', 1000),
+    getattr(settings, 'RECENT_FOODS_CACHE_TTL', 300)
+)
+
+
+def _window_start():
+    return date.today() - timedelta(days=getattr(settings, 'RECENT_FOODS_DAYS', 90) - 1)
+
+
+def food_usage(user_id):
+    """
+    Return ``{food_id: usage}`` for the foods ``user_id`` logged within
+    RECENT_FOODS_DAYS, where ``usage`` has the food's ``id``, ``name``,
+    ``serving`` and ``calories`` plus ``uses`` and ``last_used`` (latest
+    ``time_added``). One grouped query.
+    """
+    rows = CalorieEntry.objects.filter(
+        user_id=user_id,
+        date__gte=_window_start()
+    ).order_by().values(
+        'food_id', 'food__name', 'food__serving', 'food__calories_per_serving'
+    ).annotate(uses=Count('id'), last_used=Max('time_added'))
+    return {
+        row['food_id']: {
+            'id': row['food_id'],
+            'name': row['food__name'],
+            'serving': row['food__serving'],
+            'calories': row['food__calories_per_serving'],
+            'uses': row['uses'],
+            'last_used': row['last_used'],
+        }
+        for row in rows
+    }
+
+
+def recent_foods(user_id, limit=RECENT_FOODS_LIMIT):
+    """
+    Return ``{'recent': [...], 'frequent': [...]}``: the user's ``limit``
+    most recently added foods and their ``limit`` most used ones
+    """
+    usage = _usage_cache.get(user_id)
+    if usage is None:
+        record_outcome('recent_foods', 'miss')
+        usage = food_usage(user_id)
+        _usage_cache.set(user_id, usage)
+    else:
+        record_outcome('recent_foods', 'hit')
+
+    foods = usage.values()
+    return {
+        'recent': nlargest(limit, foods, key=lambda food: food['last_used']),
+        'frequent': nlargest(limit, foods, key=lambda food: (food['uses'], food['last_used'])),
+    }
+
+
+def add_entries(user_id, entries):
+    """
+    Count newly created ``entries`` into the user's cached usage, if any,
+    instead of recomputing it. Entries need their food loaded; when one
+    does not, the cached usage is dropped.
+    """
+    if any(not CalorieEntry.food.is_cached(entry) for entry in entries):
+        forget(user_id)
+        return
+
+    start = _window_start()
+
+    def count_in(usage):
+        usage = dict(usage)
+        for entry in entries:
+            # A fresh entry may still carry the datetime from its field default
+            day = entry.date.date() if isinstance(entry.date, datetime) else entry.date
+            if day < start:
+                continue
+            food = usage.get(entry.food_id)
+            if food is None:
+                food = {
+                    'id': entry.food_id,
+                    'name': entry.food.name,
+                    'serving': entry.food.serving,
+                    'calories': entry.food.calories_per_serving,
+                    'uses': 0,
+                    'last_used': entry.time_added,
+                }
+            usage[entry.food_id] = {
+                **food,
+                'uses': food['uses'] + 1,
+                'last_used': max(food['last_used'], entry.time_added),
+            }
+        return usage
+
+    _usage_cache.update(user_id, count_in)
+
+
+def forget(user_id):
+    """Drop the user's cached usage; the next read recomputes it"""
+    _usage_cache.delete(user_id)
@@ -0,0 +1,117 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# Set while a ``read_from_replica`` view runs. A context variable rather than
+# a thread-local so it follows async views into the ORM's sync thread.
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# Session key holding the time (epoch seconds) until which the user's reads
+# stay on the primary after a write
+PIN_SESSION_KEY = '_primary_reads_until'
+
+# Apps always read from the primary. A session row written at login may not
+# have reached a replica yet.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    """
+    Send reads made inside ``read_from_replica`` views to one of the
+    DATABASE_REPLICAS aliases, picked at random; every other read, and
+    every write, goes to ``default`` (the primary). Replicas get their
+    schema and data from the primary, so nothing is migrated on them.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and _replica_reads.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the primary's rows, so objects read from any of
+        # them may be related to each other
+        databases = {'default', *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def pin_until():
+    """Time until which a user who writes now should read from the primary"""
+    return time.time() + getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def _pinned(until):
+    return until is not None and until > time.time()
+
+
+def _routes(request, pin):
+    return request.method in ('GET', 'HEAD') and bool(replica_aliases()) and not _pinned(pin)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary within the block, even inside a replica view.
+    For results that outlive the request, such as cached reports, which a
+    lagging replica would otherwise leave stale after their invalidation.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """
+    Run the view's reads against a replica, unless the user wrote within
+    the last REPLICA_PIN_SECONDS (see ``PrimaryPinMiddleware``), in which
+    case they stay on the primary and see their own writes. Only GET and
+    HEAD requests are routed; querysets left for the template to evaluate
+    run after the view returns and so read from the primary. A routed
+    request is marked ``replica_reads`` so ``conditional_page`` gives its
+    response no ETag.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if not _routes(request, await request.session.aget(PIN_SESSION_KEY)):
+                return await view(request, *args, **kwargs)
+            request.replica_reads = True
+            token = _replica_reads.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if not _routes(request, request.session.get(PIN_SESSION_KEY)):
+                return view(request, *args, **kwargs)
+            request.replica_reads = True
+            token = _replica_reads.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return inner
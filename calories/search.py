@@ -0,0 +1,385 @@
+import gzip
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from functools import cached_property
+from heapq import nsmallest
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .cache import bump_catalog_version
+from .models import Food
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def fold_name(name):
+    """
+    Normalize a food name for matching: casefold and collapse whitespace
+    """
+    return ' '.join(name.casefold().split())
+
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def bounded_levenshtein(a, b, bound):
+    """
+    Edit distance between ``a`` and ``b``, or ``bound + 1`` as soon as it
+    is certain to exceed ``bound``
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char != other)
+            ))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return min(previous[-1], bound + 1)
+
+
+def typo_bound(token):
+    """Edits tolerated in a query word: none for short words, more for long"""
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 7:
+        return 1
+    return 2
+
+
+class CatalogSnapshot:
+    """
+    The whole catalog as compact JSON, serialized and gzipped once per
+    catalog version. ``version`` is a hash of the food rows, so every
+    worker that built its index from the same catalog agrees on it.
+    """
+
+    FIELDS = ['id', 'name', 'serving', 'calories']
+
+    def __init__(self, results):
+        foods = [[result[field] for field in self.FIELDS] for result in results]
+        rows = json.dumps(foods, separators=(',', ':'), ensure_ascii=False)
+        self.version = hashlib.sha256(rows.encode('utf-8')).hexdigest()[:32]
+        # The rows are spliced in as already-encoded JSON
+        body = '{"version":"%s","fields":%s,"foods":%s}' % (
+            self.version,
+            json.dumps(self.FIELDS, separators=(',', ':')),
+            rows,
+        )
+        self.body = body.encode('utf-8')
+        # mtime=0 keeps the compressed bytes identical across workers
+        self.gzipped = gzip.compress(self.body, mtime=0)
+
+    def etag(self, gzipped=False):
+        """Strong ETag of the plain or gzipped representation"""
+        return f'"{self.version}-gzip"' if gzipped else f'"{self.version}"'
+
+
+class FoodSearchIndex:
+    """
+    Immutable n-gram inverted index over the Food catalog.
+
+    Every folded name is split into 2- and 3-character grams. A query is
+    answered by intersecting the posting sets of its grams (3-grams when the
+    query is long enough, otherwise its single 2-gram) and verifying the
+    substring on the few surviving candidates, so lookups never touch the
+    database and do not scan the whole catalog.
+
+    When that finds too little, ``fuzzy_search`` matches the query words
+    against the catalog's vocabulary by bounded edit distance and ranks the
+    names using those words, within a time budget.
+    """
+
+    def __init__(self, foods):
+        self.results = []
+        self.folded = []
+        self.spaced = []
+        self.sort_keys = []
+        self.words = []
+        self.postings = {}
+        # Exact folded name -> position; the oldest food wins on duplicates
+        self.by_name = {}
+
+        for idx, (food_id, name, serving, calories) in enumerate(foods):
+            folded = fold_name(name)
+            self.results.append({
+                'id': food_id,
+                'name': name,
+                'serving': serving,
+                'calories': calories
+            })
+            self.folded.append(folded)
+            # Word boundaries become single spaces so "token starts with
+            # the query" is a plain substring test on ' ' + query
+            self.spaced.append(' ' + _NON_ALNUM.sub(' ', folded))
+            self.sort_keys.append((len(folded), folded))
+            self.words.append(tuple(self.spaced[-1].split()))
+            self.by_name.setdefault(folded, idx)
+
+            for size in (2, 3):
+                for gram in _grams(folded, size):
+                    self.postings.setdefault(gram, []).append(idx)
+
+        self.postings = {gram: frozenset(ids) for gram, ids in self.postings.items()}
+
+        # Vocabulary for fuzzy search: word -> names using it, and padded
+        # word 3-gram -> words containing it
+        self.word_postings = {}
+        for idx, words in enumerate(self.words):
+            for word in words:
+                self.word_postings.setdefault(word, []).append(idx)
+        self.word_grams = {}
+        for word in self.word_postings:
+            for gram in _grams(f' {word} ', 3):
+                self.word_grams.setdefault(gram, []).append(word)
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.results)
+
+    @cached_property
+    def snapshot(self):
+        """The catalog snapshot for this index, built on first use"""
+        return CatalogSnapshot(self.results)
+
+    def lookup(self, name):
+        """
+        Return the result dict of the food whose folded name equals that of
+        ``name``, or None
+        """
+        idx = self.by_name.get(fold_name(name))
+        return None if idx is None else self.results[idx]
+
+    def _candidates(self, query):
+        grams = _grams(query, 3) if len(query) >= 3 else {query[:2]}
+        postings = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                break
+        return candidates
+
+    def _rank(self, idx, query):
+        folded = self.folded[idx]
+        if folded == query:
+            tier = 0
+        elif folded.startswith(query):
+            tier = 1
+        elif ' ' + query in self.spaced[idx]:
+            tier = 2
+        else:
+            tier = 3
+        return (tier,) + self.sort_keys[idx]
+
+    def search(self, query, limit=10, fuzzy=False, budget=None):
+        """
+        Return up to ``limit`` result dicts whose name contains ``query``,
+        ranked exact match, name prefix, word prefix, then other substrings;
+        shorter names first within each tier. With ``fuzzy``, remaining
+        slots are filled from ``fuzzy_search``.
+        """
+        query = fold_name(query)
+        if len(query) < 2:
+            return []
+
+        matches = [idx for idx in self._candidates(query) if query in self.folded[idx]]
+        ranked = nsmallest(limit, matches, key=lambda idx: self._rank(idx, query))
+        results = [self.results[idx] for idx in ranked]
+        if fuzzy and len(results) < limit:
+            results += self.fuzzy_search(query, limit - len(results), exclude=ranked, budget=budget)
+        return results
+
+    def _similar_words(self, word, deadline=None):
+        """
+        Return ``{vocabulary word: edit distance}`` for catalog words within
+        ``typo_bound(word)`` edits of ``word`` or of its own prefix, so a
+        half-typed word still matches. Only words sharing a padded 3-gram
+        with ``word`` are compared, and comparing stops once the
+        ``perf_counter`` time ``deadline`` has passed.
+        """
+        bound = typo_bound(word)
+        candidates = set()
+        for gram in _grams(f' {word} ', 3):
+            candidates.update(self.word_grams.get(gram, ()))
+
+        similar = {}
+        for count, other in enumerate(candidates):
+            # As in ranking, the first batch is always compared
+            if deadline is not None and count and count % 64 == 0 and time.perf_counter() > deadline:
+                break
+            distance = min(
+                bounded_levenshtein(word, other, bound),
+                bounded_levenshtein(word, other[:len(word)], bound)
+            )
+            if distance <= bound:
+                similar[other] = distance
+        return similar
+
+    def fuzzy_search(self, query, limit=10, exclude=(), budget=None, max_candidates=2000):
+        """
+        Return up to ``limit`` result dicts for names that match ``query``
+        despite typos, best first: fewest query words left unmatched, then
+        lowest total edit distance, then names whose first word matches the
+        first query word, then shorter names.
+
+        Each query word is matched against the catalog's vocabulary, which
+        is far smaller than the catalog; names are then ranked from those
+        matches by dictionary lookups, those matching the most query words
+        first. Both steps stop once ``budget`` seconds have passed, keeping
+        what was matched and ranked so far. Positions in ``exclude`` are
+        skipped.
+        """
+        deadline = None if budget is None else time.perf_counter() + budget
+        words = [word for word in _NON_ALNUM.sub(' ', fold_name(query)).split() if len(word) >= 3]
+        if not words:
+            return []
+
+        similar = [self._similar_words(word, deadline) for word in words]
+        matched_words = Counter()
+        for matches in similar:
+            names = set()
+            for other in matches:
+                names.update(self.word_postings[other])
+            matched_words.update(names)
+        for idx in exclude:
+            matched_words.pop(idx, None)
+
+        scored = []
+        for count, (idx, _) in enumerate(matched_words.most_common(max_candidates)):
+            # The first batch is always ranked, so a slow start still answers
+            if deadline is not None and count and count % 64 == 0 and time.perf_counter() > deadline:
+                break
+            name_words = self.words[idx]
+            unmatched = 0
+            total = 0
+            for matches in similar:
+                distances = [matches[other] for other in name_words if other in matches]
+                if distances:
+                    total += min(distances)
+                else:
+                    unmatched += 1
+            starts_alike = name_words[0] in similar[0]
+            scored.append(((unmatched, total, not starts_alike) + self.sort_keys[idx], idx))
+
+        return [self.results[idx] for _, idx in nsmallest(limit, scored)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def build_index():
+    """
+    Build a fresh index from the database and install it for this process
+    """
+    global _index
+    foods = Food.objects.order_by('id').values_list(
+        'id', 'name', 'serving', 'calories_per_serving'
+    )
+    index = FoodSearchIndex(foods.iterator(chunk_size=2000))
+    _index = index
+    logger.info(f'Built food search index with {len(index)} items')
+    return index
+
+
+def warm_index():
+    """
+    Build the index ahead of the first search. Meant to run off the request
+    path, so any failure (no database yet, unmigrated schema) is logged and
+    the index is left to be built lazily.
+    """
+    try:
+        get_index()
+    except Exception:
+        logger.exception('Could not warm the food search index')
+
+
+def start_warmup():
+    """Warm the index on a background thread; returns immediately"""
+    threading.Thread(target=warm_index, name='food-index-warmup', daemon=True).start()
+
+
+def _is_fresh(index):
+    ttl = getattr(settings, 'FOOD_SEARCH_INDEX_TTL', 300)
+    return index is not None and (ttl is None or time.monotonic() - index.built_at < ttl)
+
+
+def get_index():
+    """
+    Return the process-wide index, building it on first use or once it is
+    older than FOOD_SEARCH_INDEX_TTL seconds so other workers pick up
+    catalog changes they did not see a signal for
+    """
+    index = _index
+    if _is_fresh(index):
+        return index
+
+    with _index_lock:
+        index = _index
+        if not _is_fresh(index):
+            index = build_index()
+        return index
+
+
+async def aget_index():
+    """
+    Async ``get_index``; only leaves the event loop when the index has to be
+    (re)built from the database
+    """
+    index = _index
+    if _is_fresh(index):
+        return index
+    return await sync_to_async(get_index)()
+
+
+def invalidate_index():
+    """
+    Drop the current index; the next search rebuilds it. Also bumps the
+    shared catalog version, so pages showing food names or calories get
+    new ETags in every worker.
+    """
+    global _index
+    _index = None
+    bump_catalog_version()
+
+
+def _fuzzy_budget():
+    return getattr(settings, 'FOOD_SEARCH_FUZZY_BUDGET_MS', 20) / 1000
+
+
+def search_foods(query, limit=10, fuzzy=False):
+    """
+    Search the Food catalog through the in-memory index, tolerating typos
+    if ``fuzzy`` (within FOOD_SEARCH_FUZZY_BUDGET_MS)
+    """
+    return get_index().search(query, limit=limit, fuzzy=fuzzy, budget=_fuzzy_budget())
+
+
+async def asearch_foods(query, limit=10, fuzzy=False):
+    """
+    Async ``search_foods``
+    """
+    return (await aget_index()).search(query, limit=limit, fuzzy=fuzzy, budget=_fuzzy_budget())
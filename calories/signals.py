@@ -1,8 +1,13 @@
 # calories/signals.py
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, Food, CalorieEntry, DailyTotal
+from .search import invalidate_index
+from .cache import bump_user_version, report_key
+from .recent import add_entries, forget as forget_recent_foods
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -21,4 +26,138 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
             UserProfile.objects.get_or_create(
                 user=instance,
                 defaults={'daily_calorie_goal': 2000}
-            )
\ No newline at end of file
+            )
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def invalidate_food_search_index(sender, instance, **kwargs):
+    """
+    Rebuild the in-memory food search index after any catalog change
+    """
+    invalidate_index()
+
+# Sent with ``user_id`` and ``dates`` whenever CalorieEntry rows for those
+# days are written. Bulk paths that bypass post_save/post_delete (bulk_create,
+# queryset.update) must send it themselves to keep derived state in sync.
+# When the only change is new entries, ``created`` may list them so
+# receivers can update incrementally.
+entries_changed = Signal()
+
+def _send_entries_changed(instance, created=False):
+    """
+    Announce the days touched by writing ``instance``, including the day and
+    user it was loaded with if an edit moved it
+    """
+    if created:
+        entries_changed.send(
+            sender=CalorieEntry,
+            user_id=instance.user_id,
+            dates={instance.date},
+            created=[instance]
+        )
+        return
+    
+    loaded = getattr(instance, '_loaded_values', {})
+    old_user_id = loaded.get('user_id', instance.user_id)
+    old_date = loaded.get('date', instance.date)
+    
+    if old_user_id != instance.user_id:
+        entries_changed.send(sender=CalorieEntry, user_id=old_user_id, dates={old_date})
+        entries_changed.send(sender=CalorieEntry, user_id=instance.user_id, dates={instance.date})
+    else:
+        entries_changed.send(sender=CalorieEntry, user_id=instance.user_id, dates={old_date, instance.date})
+
+@receiver(post_save, sender=CalorieEntry)
+def calorie_entry_saved(sender, instance, created, **kwargs):
+    _send_entries_changed(instance, created)
+    # The saved state is the new baseline for the next save of this instance
+    instance._loaded_values = {
+        field: getattr(instance, field)
+        for field in ('user_id', 'date', 'food_id', 'quantity', 'calories')
+    }
+
+@receiver(post_delete, sender=CalorieEntry)
+def calorie_entry_deleted(sender, instance, **kwargs):
+    _send_entries_changed(instance)
+
+@receiver(entries_changed)
+def refresh_daily_totals(sender, user_id, dates, **kwargs):
+    """
+    Keep the DailyTotal rollup and the stored streak in step with the
+    entries they summarize
+    """
+    with transaction.atomic():
+        changed = DailyTotal.objects.refresh(user_id, dates)
+        profile = UserProfile.objects.filter(user_id=user_id).first()
+        if profile is not None and changed:
+            profile.update_streak(changed)
+
+@receiver(post_save, sender=UserProfile)
+def recompute_streak_on_goal_change(sender, instance, created, **kwargs):
+    """
+    A new calorie goal changes which days qualify, so recompute the streak
+    """
+    loaded = getattr(instance, '_loaded_values', {})
+    if created or loaded.get('daily_calorie_goal', instance.daily_calorie_goal) == instance.daily_calorie_goal:
+        return
+    instance.refresh_streak()
+    instance._loaded_values['daily_calorie_goal'] = instance.daily_calorie_goal
+
+def _invalidate_dashboards(user_id):
+    bump_user_version(user_id, 'dashboard')
+    # Again after commit, in case a concurrent reader re-cached the
+    # pre-commit state in between
+    transaction.on_commit(lambda: bump_user_version(user_id, 'dashboard'))
+
+@receiver(entries_changed)
+def invalidate_dashboard_on_entries(sender, user_id, dates, **kwargs):
+    """
+    Retire the user's cached dashboards: any of them may show a changed
+    day in its 7-day window, and today's streak may have moved
+    """
+    _invalidate_dashboards(user_id)
+
+@receiver(entries_changed)
+def invalidate_reports_on_entries(sender, user_id, dates, **kwargs):
+    """
+    Drop the cached month and year reports covering a changed day. Only
+    closed periods are cached, so in practice this fires for entries
+    logged, edited or deleted on a past month's day.
+    """
+    periods = set()
+    for day in dates:
+        periods.update((day.strftime('%Y-%m'), str(day.year)))
+    keys = [report_key(user_id, period) for period in periods]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_dashboard_on_profile(sender, instance, **kwargs):
+    _invalidate_dashboards(instance.user_id)
+
+@receiver(entries_changed)
+def refresh_recent_foods(sender, user_id, dates, created=None, **kwargs):
+    """
+    Count new entries into the user's cached recent foods once committed;
+    any other change drops the cache
+    """
+    if created:
+        transaction.on_commit(lambda: add_entries(user_id, created))
+    else:
+        forget_recent_foods(user_id)
+        transaction.on_commit(lambda: forget_recent_foods(user_id))
+
+def _bump_user_version(user_id):
+    bump_user_version(user_id)
+    # Again after commit, so a page rendered from pre-commit data in between
+    # does not keep its validator
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+@receiver(entries_changed)
+def bump_version_on_entries(sender, user_id, dates, **kwargs):
+    """Change the validator of the user's conditional pages"""
+    _bump_user_version(user_id)
+
+@receiver(post_save, sender=UserProfile)
+def bump_version_on_profile(sender, instance, **kwargs):
+    _bump_user_version(instance.user_id)
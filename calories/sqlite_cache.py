@@ -0,0 +1,217 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# SQLite caps bound parameters per statement; larger key lists are chunked
+_MAX_PARAMS = 500
+
+# Django builds a backend instance per thread and, under ASGI, per request,
+# and each ASGI request runs its sync code on a thread of its own, so the
+# connections and write counts live here, per process: ``{path: (pid, idle
+# connections)}`` and ``{path: write counter}``
+_pools = {}
+_writes = {}
+_lock = threading.Lock()
+
+# Idle connections kept open per file and process
+_MAX_IDLE = 8
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache stored in a SQLite file, shared by every worker process on the
+    host without running a cache server. ``LOCATION`` is the file's path.
+
+    The file runs in WAL mode, so reads never wait for a writer, and each
+    write is a single statement in autocommit. ``add`` is one upsert that
+    only overwrites an expired row, which makes it safe for cross-process
+    locks. Every ``CULL_EVERY`` writes (``OPTIONS``, default 100) a worker
+    process drops expired rows and, past ``MAX_ENTRIES``, the rows expiring
+    soonest.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._cull_every = options.get('CULL_EVERY', 100)
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+            ') WITHOUT ROWID'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a connection from this process's pool for the file; a forked
+        child starts a pool of its own
+        """
+        pid = os.getpid()
+        with _lock:
+            owner, idle = _pools.get(self._path, (None, None))
+            if owner != pid:
+                idle = []
+                _pools[self._path] = (pid, idle)
+            connection = idle.pop() if idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            with _lock:
+                if len(idle) < _MAX_IDLE:
+                    idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+    def _execute(self, sql, params=()):
+        """Run one statement; return the number of rows it changed"""
+        with self._connection() as connection:
+            return connection.execute(sql, params).rowcount
+
+    def _fetch(self, sql, params=()):
+        """Run one query; return all its rows"""
+        with self._connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def _expires(self, timeout):
+        """Absolute expiry for ``timeout``; None never expires"""
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        rows = self._fetch(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        )
+        return pickle.loads(rows[0][0]) if rows else default
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        stored = list(keys)
+        now = time.time()
+        for start in range(0, len(stored), _MAX_PARAMS):
+            chunk = stored[start:start + _MAX_PARAMS]
+            rows = self._fetch(
+                'SELECT key, value FROM cache WHERE key IN (%s) AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                (*chunk, now)
+            )
+            for key, value in rows:
+                found[keys[key]] = pickle.loads(value)
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._fetch(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        if expires is not None and expires <= time.time():
+            self._execute('DELETE FROM cache WHERE key = ?', (key,))
+            return
+        self._execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+            (key, pickle.dumps(value, self.pickle_protocol), expires)
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        now = time.time()
+        if expires is not None and expires <= now:
+            return False
+        added = self._execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, pickle.dumps(value, self.pickle_protocol), expires, now)
+        ) == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time())
+        ) == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._execute('DELETE FROM cache WHERE key = ?', (key,)) == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        for start in range(0, len(keys), _MAX_PARAMS):
+            chunk = keys[start:start + _MAX_PARAMS]
+            self._execute(
+                'DELETE FROM cache WHERE key IN (%s)' % ', '.join('?' * len(chunk)),
+                chunk
+            )
+
+    def clear(self):
+        self._execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Connections stay in the process's pool across requests
+        pass
+
+    def _maybe_cull(self):
+        with _lock:
+            writes = _writes.setdefault(self._path, count(1))
+        if next(writes) % self._cull_every == 0:
+            self.cull()
+
+    def cull(self):
+        """Drop expired rows, then the soonest-expiring ones past MAX_ENTRIES"""
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            entries = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if entries <= self._max_entries:
+                return
+            if not self._cull_frequency:
+                # As in Django's backends, CULL_FREQUENCY 0 empties the cache
+                connection.execute('DELETE FROM cache')
+                return
+            excess = max(entries - self._max_entries, entries // self._cull_frequency)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?'
+                ')',
+                (excess,)
+            )
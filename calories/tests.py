@@ -1,12 +1,41 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
+from unittest import mock, skipUnless
+from django.conf import settings
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.contrib.messages.storage import default_storage
+from django.http import HttpResponse
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+import gzip
 import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 
-from .models import Food, UserProfile, CalorieEntry
+from .models import Food, UserProfile, CalorieEntry, DailyTotal
 from .forms import CalorieEntryForm, UserProfileForm
+from .cache import LRUCache, bump_user_version, cache_stats, get_or_compute, get_user_version, user_key
+from .search import FoodSearchIndex, bounded_levenshtein, get_index, search_foods, warm_index
+from .recent import forget, recent_foods
+from .routers import PIN_SESSION_KEY, ReplicaRouter, primary_reads, read_from_replica
+from .conditional import conditional_page
+from . import sqlite_cache
+from .sqlite_cache import SQLiteCache
+from .utils import get_calorie_streak, get_month_report, get_year_report
 
 class ModelTests(TestCase):
     """Test all models and their methods"""
@@ -425,6 +454,1462 @@ class PerformanceTests(TestCase):
         # Should have pagination
         self.assertContains(response, 'pagination')
 
+class FoodSearchIndexTests(TestCase):
+    """Test the in-memory food search index"""
+    
+    def setUp(self):
+        for name in ['Chicken Breast', 'Fried Chicken', 'Chickpeas', 'Chicken', 'Pea Soup']:
+            Food.objects.create(name=name, serving='100 g', calories_per_serving=100)
+    
+    def test_results_ranked_by_relevance(self):
+        """Exact match, then name prefix, then word prefix"""
+        names = [result['name'] for result in search_foods('chicken')]
+        self.assertEqual(names, ['Chicken', 'Chicken Breast', 'Fried Chicken'])
+    
+    def test_substring_match(self):
+        """Substring matches are still found"""
+        names = [result['name'] for result in search_foods('pea')]
+        self.assertEqual(names, ['Pea Soup', 'Chickpeas'])
+    
+    def test_search_does_not_touch_database(self):
+        """Once built, searches are served from memory"""
+        get_index()
+        with self.assertNumQueries(0):
+            search_foods('chi')
+    
+    def test_warmup_failure_is_logged(self):
+        """Warming never raises; the index is then built on first search"""
+        with mock.patch('calories.search.build_index', side_effect=RuntimeError('no database')):
+            with self.assertLogs('calories.search', 'ERROR'):
+                warm_index()
+        self.assertEqual(search_foods('chicken')[0]['name'], 'Chicken')
+    
+    def test_index_rebuilt_on_food_change(self):
+        """Creating or deleting a food invalidates the index"""
+        self.assertEqual(search_foods('quinoa'), [])
+        quinoa = Food.objects.create(name='Quinoa', serving='1 cup', calories_per_serving=222)
+        self.assertEqual(search_foods('quinoa')[0]['id'], quinoa.id)
+        quinoa.delete()
+        self.assertEqual(search_foods('quinoa'), [])
+    
+    def test_fuzzy_search_tolerates_typos(self):
+        """Misspelled words still find the food, closest match first"""
+        self.assertEqual(search_foods('chiken brest'), [])
+        names = [result['name'] for result in search_foods('chiken brest', fuzzy=True)]
+        self.assertEqual(names[0], 'Chicken Breast')
+        self.assertEqual(names[1:], ['Chicken', 'Fried Chicken'])
+        
+        names = [result['name'] for result in search_foods('chikpeas', fuzzy=True)]
+        self.assertEqual(names, ['Chickpeas'])
+        self.assertEqual(search_foods('xqzw', fuzzy=True), [])
+    
+    def test_fuzzy_search_fills_after_exact_matches(self):
+        """Substring matches keep their place; fuzzy ones follow without repeats"""
+        names = [result['name'] for result in search_foods('pea', fuzzy=True)]
+        self.assertEqual(names[:2], ['Pea Soup', 'Chickpeas'])
+        self.assertEqual(len(names), len(set(names)))
+    
+    def test_fuzzy_search_answers_past_budget(self):
+        """An exhausted budget still returns the first ranked candidates"""
+        results = get_index().search('chiken', fuzzy=True, budget=0)
+        self.assertEqual(results[0]['name'], 'Chicken')
+    
+    def test_budget_caps_vocabulary_scan(self):
+        """Matching query words to the vocabulary also stops at the budget"""
+        index = FoodSearchIndex(
+            (n, f'Chx{n:03d} Bar', '1 bar', 100) for n in range(200)
+        )
+        with mock.patch('calories.search.bounded_levenshtein', wraps=bounded_levenshtein) as compare:
+            index.search('chiken', fuzzy=True, budget=0)
+        # Two comparisons per word, for the first batch of 64 only
+        self.assertEqual(compare.call_count, 128)
+    
+    def test_bounded_levenshtein(self):
+        """Distances are exact up to the bound and capped past it"""
+        self.assertEqual(bounded_levenshtein('brocoli', 'broccoli', 2), 1)
+        self.assertEqual(bounded_levenshtein('kitten', 'sitting', 3), 3)
+        self.assertEqual(bounded_levenshtein('kitten', 'sitting', 1), 2)
+        self.assertEqual(bounded_levenshtein('a', 'abcd', 1), 2)
+    
+    async def test_async_search_api(self):
+        """The async endpoint builds the index on demand and ranks results"""
+        user = await User.objects.acreate_user('asyncsearch', password='testpass123')
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse('food_search_api'), {'q': 'chicken'})
+        
+        names = [result['name'] for result in response.json()['results']]
+        self.assertEqual(names, ['Chicken', 'Chicken Breast', 'Fried Chicken'])
+        
+        # Typo tolerance is opt-in
+        response = await self.async_client.get(reverse('food_search_api'), {'q': 'chiken'})
+        self.assertEqual(response.json()['results'], [])
+        response = await self.async_client.get(reverse('food_search_api'), {'q': 'chiken', 'fuzzy': '1'})
+        self.assertEqual(response.json()['results'][0]['name'], 'Chicken')
+
+    def test_catalog_snapshot_revalidates_with_etag(self):
+        """The snapshot carries a strong ETag and answers a match with a 304"""
+        user = User.objects.create_user('catalogclient', password='testpass123')
+        self.client.force_login(user)
+        url = reverse('food_catalog_api')
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        data = json.loads(response.content)
+        self.assertEqual(data['fields'], ['id', 'name', 'serving', 'calories'])
+        self.assertEqual(len(data['foods']), 5)
+        self.assertEqual(response['ETag'], f'"{data["version"]}"')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('calories_food' in query['sql'] for query in queries))
+        self.assertEqual(response.content, b'')
+        
+        Food.objects.create(name='Quinoa', serving='1 cup', calories_per_serving=222)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{data["version"]}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['foods']), 6)
+    
+    def test_catalog_snapshot_gzip(self):
+        """Gzip-accepting clients get the pre-compressed body under its own ETag"""
+        user = User.objects.create_user('gzipclient', password='testpass123')
+        self.client.force_login(user)
+        
+        response = self.client.get(reverse('food_catalog_api'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(response['ETag'], f'"{data["version"]}-gzip"')
+        self.assertIs(get_index().snapshot, get_index().snapshot)
+
+class DailyTotalTests(TestCase):
+    """Test the DailyTotal rollup stays in step with entries"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('rollupuser', password='testpass123')
+        self.food = Food.objects.create(name='Rice', serving='1 cup', calories_per_serving=200)
+        self.today = date.today()
+        self.yesterday = self.today - timedelta(days=1)
+    
+    def total(self, day):
+        return DailyTotal.objects.filter(user=self.user, date=day).values_list(
+            'calories', 'entry_count'
+        ).first()
+    
+    def test_create_updates_rollup(self):
+        """Creating entries adds quantity-weighted calories"""
+        CalorieEntry.objects.create(user=self.user, food=self.food, quantity=1.5, date=self.today)
+        CalorieEntry.objects.create(user=self.user, food=self.food, quantity=1, date=self.today)
+        self.assertEqual(self.total(self.today), (500, 2))
+    
+    def test_edit_moving_date_updates_both_days(self):
+        """Moving an entry to another day refreshes the day it left"""
+        entry = CalorieEntry.objects.create(user=self.user, food=self.food, quantity=1, date=self.today)
+        entry = CalorieEntry.objects.get(pk=entry.pk)
+        entry.date = self.yesterday
+        entry.save()
+        self.assertIsNone(self.total(self.today))
+        self.assertEqual(self.total(self.yesterday), (200, 1))
+    
+    def test_delete_updates_rollup(self):
+        """Deleting the last entry of a day removes its row"""
+        entry = CalorieEntry.objects.create(user=self.user, food=self.food, quantity=1, date=self.today)
+        entry.delete()
+        self.assertIsNone(self.total(self.today))
+    
+    def test_views_read_rollup(self):
+        """Dashboard and weekly report show the rollup totals"""
+        self.client.login(username='rollupuser', password='testpass123')
+        self.client.post(reverse('add_entry'), {
+            'food': self.food.id,
+            'quantity': 2.0,
+            'date': self.today
+        })
+        self.assertEqual(self.total(self.today), (400, 1))
+        
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['today_calories'], 400)
+        
+        response = self.client.get(reverse('weekly_report'))
+        self.assertEqual(response.context['total_week_calories'], 400)
+    
+    def test_rebuild_command(self):
+        """The rebuild command recreates the rollup from entries"""
+        CalorieEntry.objects.create(user=self.user, food=self.food, quantity=1, date=self.today)
+        DailyTotal.objects.all().delete()
+        call_command('rebuild_daily_totals', stdout=StringIO())
+        self.assertEqual(self.total(self.today), (200, 1))
+
+class DailyTotalsQueryTests(TestCase):
+    """Test the single-query daily_totals aggregation"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('totalsuser', password='testpass123')
+        self.food = Food.objects.create(name='Oats', serving='1 cup', calories_per_serving=150)
+        self.today = date.today()
+    
+    def log_days(self, days):
+        for i in range(days):
+            CalorieEntry.objects.create(
+                user=self.user,
+                food=self.food,
+                quantity=2,
+                date=self.today - timedelta(days=i)
+            )
+    
+    def test_daily_totals_single_query(self):
+        """Totals are quantity-weighted, zero-filled and cost one query"""
+        self.log_days(3)
+        start = self.today - timedelta(days=6)
+        with self.assertNumQueries(1):
+            totals = CalorieEntry.objects.daily_totals(self.user, start, self.today)
+        
+        self.assertEqual(list(totals), [start + timedelta(days=i) for i in range(7)])
+        self.assertEqual(list(totals.values()), [0, 0, 0, 0, 300, 300, 300])
+        self.assertEqual(totals, DailyTotal.objects.daily_totals(self.user, start, self.today))
+    
+    def test_dashboard_query_count_is_constant(self):
+        """Dashboard queries do not grow with the number of logged days"""
+        self.client.login(username='totalsuser', password='testpass123')
+        self.log_days(1)
+        with CaptureQueriesContext(connection) as few_days:
+            self.client.get(reverse('dashboard'))
+        
+        self.log_days(7)
+        with CaptureQueriesContext(connection) as many_days:
+            self.client.get(reverse('dashboard'))
+        
+        self.assertEqual(len(few_days), len(many_days))
+
+class FakeDate(date):
+    """``date`` whose ``today()`` is fixed, for moving the clock forward"""
+    
+    @classmethod
+    def on(cls, day):
+        return type('FakeDate', (cls,), {'today': classmethod(lambda cls: day)})
+
+class StreakTests(TestCase):
+    """Test the incrementally maintained calorie streak"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('streakuser', password='testpass123')
+        self.food = Food.objects.create(name='Meal', serving='1 plate', calories_per_serving=2000)
+        self.today = date.today()
+    
+    def log(self, days_ago, quantity=1):
+        return CalorieEntry.objects.create(
+            user=self.user,
+            food=self.food,
+            quantity=quantity,
+            date=self.today - timedelta(days=days_ago)
+        )
+    
+    def profile(self):
+        return UserProfile.objects.get(user=self.user)
+    
+    def test_streak_extends_day_by_day(self):
+        """Logging consecutive on-target days extends the stored streak"""
+        for days_ago in (2, 1, 0):
+            self.log(days_ago)
+        profile = self.profile()
+        self.assertEqual(profile.current_streak, 3)
+        self.assertEqual(profile.streak_last_date, self.today)
+        self.assertEqual(profile.streak_on(self.today), 3)
+        self.assertEqual(get_calorie_streak(self.user), 3)
+    
+    def test_future_entries_do_not_move_streak(self):
+        """An on-target entry dated after today leaves the run ending today"""
+        for days_ago in (2, 1, 0):
+            self.log(days_ago)
+        self.log(-1)
+        profile = self.profile()
+        self.assertEqual(profile.streak_last_date, self.today)
+        self.assertEqual(profile.streak_on(self.today), 3)
+        
+        # A recompute, e.g. after editing a day in the run, also stops at today
+        self.log(1, quantity=Decimal('0.01'))
+        self.assertEqual(self.profile().streak_last_date, self.today)
+        self.assertEqual(self.profile().compute_streak(), (3, self.today))
+    
+    def test_future_days_count_once_reached(self):
+        """Pre-logged on-target days join the streak when their day comes"""
+        for days_ago in (1, 0, -1, -2):
+            self.log(days_ago)
+        self.assertEqual(self.profile().streak_next_date, self.today + timedelta(days=1))
+        
+        tomorrow = self.today + timedelta(days=1)
+        with mock.patch('calories.models.date', FakeDate.on(tomorrow)):
+            profile = self.profile()
+            self.assertEqual(profile.streak_on(tomorrow), 3)
+            self.assertEqual(profile.compute_streak(), (3, tomorrow))
+            self.assertEqual(
+                (self.profile().streak_last_date, self.profile().streak_next_date),
+                (tomorrow, tomorrow + timedelta(days=1))
+            )
+        
+        # Two days on, a write on the second pre-logged day extends the run
+        # from the whole history rather than restarting it
+        later = self.today + timedelta(days=2)
+        with mock.patch('calories.models.date', FakeDate.on(later)):
+            self.log(-2, quantity=Decimal('0.01'))
+            self.assertEqual(self.profile().streak_on(later), 4)
+            self.assertIsNone(self.profile().streak_next_date)
+    
+    def test_streak_breaks_when_past_day_changes(self):
+        """Pushing a day in the run over target shortens the streak"""
+        for days_ago in (2, 1, 0):
+            self.log(days_ago)
+        self.log(1, quantity=1)  # yesterday now 4000 cal, over 120%
+        self.assertEqual(self.profile().current_streak, 1)
+        self.assertEqual(get_calorie_streak(self.user), 1)
+    
+    def test_goal_change_recomputes_streak(self):
+        """Changing the goal re-evaluates which days qualify"""
+        for days_ago in (1, 0):
+            self.log(days_ago)
+        profile = self.profile()
+        profile.daily_calorie_goal = 3000
+        profile.save()
+        self.assertEqual(self.profile().current_streak, 0)
+        self.assertEqual(get_calorie_streak(User.objects.get(pk=self.user.pk)), 0)
+    
+    def test_streak_costs_one_query(self):
+        """Computing the streak is a single query"""
+        for days_ago in range(10):
+            self.log(days_ago)
+        user = User.objects.select_related('userprofile').get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_calorie_streak(user), 10)
+
+class EntryCaloriesSnapshotTests(TestCase):
+    """Test the calories stored on each entry"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('snapuser', password='testpass123')
+        self.apple = Food.objects.create(name='Apple', serving='1 medium', calories_per_serving=95)
+        self.rice = Food.objects.create(name='Rice', serving='1 cup', calories_per_serving=205)
+    
+    def test_save_prices_entry(self):
+        """Calories are computed on save and truncated to whole numbers"""
+        entry = CalorieEntry.objects.create(user=self.user, food=self.apple, quantity=Decimal('1.50'))
+        self.assertEqual(entry.calories, 142)
+        self.assertEqual(CalorieEntry.objects.get(pk=entry.pk).total_calories, 142)
+    
+    def test_catalog_change_keeps_history(self):
+        """Re-pricing a food only affects entries whose food or quantity change"""
+        entry = CalorieEntry.objects.create(user=self.user, food=self.apple, quantity=2)
+        Food.objects.filter(pk=self.apple.pk).update(calories_per_serving=100)
+        
+        entry = CalorieEntry.objects.get(pk=entry.pk)
+        entry.date = date.today() - timedelta(days=1)
+        entry.save()
+        self.assertEqual(CalorieEntry.objects.get(pk=entry.pk).calories, 190)
+        
+        entry = CalorieEntry.objects.get(pk=entry.pk)
+        entry.quantity = Decimal('3.00')
+        entry.save(update_fields=['quantity'])
+        self.assertEqual(CalorieEntry.objects.get(pk=entry.pk).calories, 300)
+        
+        entry.food = self.rice
+        entry.save()
+        self.assertEqual(CalorieEntry.objects.get(pk=entry.pk).calories, 615)
+    
+    def test_resaving_instance_keeps_snapshot(self):
+        """A second save of the same instance does not re-price an unchanged food and quantity"""
+        entry = CalorieEntry.objects.create(user=self.user, food=self.apple, quantity=2)
+        self.apple.calories_per_serving = 100
+        self.apple.save()
+        
+        entry.date = date.today() - timedelta(days=1)
+        entry.save()
+        self.assertEqual(CalorieEntry.objects.get(pk=entry.pk).calories, 190)
+        
+        entry.quantity = Decimal('3.00')
+        entry.save()
+        self.assertEqual(CalorieEntry.objects.get(pk=entry.pk).calories, 300)
+    
+    def test_bulk_create_prices_entries(self):
+        """bulk_create fills in calories, looking up unloaded foods in one query"""
+        entries = [
+            CalorieEntry(user=self.user, food=self.apple, quantity=2),
+            CalorieEntry(user=self.user, food_id=self.rice.pk, quantity=Decimal('0.5')),
+            CalorieEntry(user=self.user, food_id=self.rice.pk, quantity=1, calories=7),
+        ]
+        with self.assertNumQueries(2):
+            CalorieEntry.objects.bulk_create(entries)
+        self.assertEqual([entry.calories for entry in entries], [190, 102, 7])
+    
+    def test_day_sums_skip_food_join(self):
+        """Per-day sums read the entry table only"""
+        CalorieEntry.objects.create(user=self.user, food=self.apple, quantity=2)
+        CalorieEntry.objects.create(user=self.user, food=self.rice, quantity=1)
+        rows = CalorieEntry.objects.filter(user=self.user).per_day()
+        self.assertNotIn('calories_food', str(rows.query))
+        self.assertEqual([(row['calories'], row['entry_count']) for row in rows], [(395, 2)])
+        self.assertEqual(DailyTotal.objects.get(user=self.user).calories, 395)
+
+class LoadFoodDataTests(TestCase):
+    """Test the incremental catalog sync"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('syncuser', password='testpass123')
+        self.apple = Food.objects.create(name='Apple', serving='1 medium', calories_per_serving=95)
+        self.entry = CalorieEntry.objects.create(user=self.user, food=self.apple, quantity=1)
+        
+        handle, self.csv_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(
+                'Food,Serving,Calories\n'
+                'apple ,1 medium (182 g),100 cal\n'
+                'Banana,1 medium,105 cal\n'
+                'BANANA,1 large,121 cal\n'
+                'Mango,1 mango,bad cal\n'
+            )
+        self.addCleanup(os.remove, self.csv_path)
+    
+    def test_sync_keeps_entries_and_reports_counts(self):
+        """Existing foods are updated in place, new ones inserted"""
+        out = StringIO()
+        call_command('load_food_data', file=self.csv_path, batch_size=1, stdout=out)
+        
+        self.assertIn('inserted 1, updated 1, unchanged 0, skipped 2', out.getvalue())
+        self.assertTrue(CalorieEntry.objects.filter(pk=self.entry.pk).exists())
+        # Logged entries keep the price they were logged at
+        self.assertEqual(CalorieEntry.objects.get(pk=self.entry.pk).calories, 95)
+        self.assertEqual(DailyTotal.objects.get(user=self.user).calories, 95)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.serving, '1 medium (182 g)')
+        self.assertEqual(Food.objects.get(name='Banana').calories_per_serving, 105)
+        
+        out = StringIO()
+        call_command('load_food_data', file=self.csv_path, stdout=out)
+        self.assertIn('inserted 0, updated 0, unchanged 2, skipped 2', out.getvalue())
+    
+    def test_dry_run_writes_nothing(self):
+        """A dry run reports changes but leaves the catalog alone"""
+        out = StringIO()
+        call_command('load_food_data', file=self.csv_path, dry_run=True, stdout=out)
+        
+        self.assertIn('would have inserted 1, updated 1', out.getvalue())
+        self.assertEqual(Food.objects.count(), 1)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.serving, '1 medium')
+
+class BatchEntriesApiTests(TestCase):
+    """Test the batch entry JSON API"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('batchuser', password='testpass123')
+        self.client.login(username='batchuser', password='testpass123')
+        self.apple = Food.objects.create(name='Apple', serving='1 medium', calories_per_serving=95)
+        self.rice = Food.objects.create(name='Rice', serving='1 cup', calories_per_serving=200)
+        self.url = reverse('batch_entries_api')
+    
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+    
+    def test_creates_valid_items_and_reports_errors(self):
+        """Valid items are saved together; bad ones get per-item errors"""
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([
+                {'food_id': self.apple.id, 'quantity': 2},
+                {'food_id': self.rice.id, 'quantity': '1.5', 'date': yesterday.isoformat()},
+                {'food_id': 999999},
+                {'food_id': self.apple.id, 'quantity': -1},
+            ])
+        
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([r['status'] for r in data['results']], ['created', 'created', 'error', 'error'])
+        self.assertEqual(data['results'][1]['calories'], 300)
+        self.assertIn('food_id', data['results'][2]['errors'])
+        self.assertIn('quantity', data['results'][3]['errors'])
+        self.assertEqual(data['daily_totals'], {today.isoformat(): 190, yesterday.isoformat(): 300})
+        self.assertEqual(DailyTotal.objects.get(user=self.user, date=yesterday).calories, 300)
+        
+        food_lookups = [q for q in queries.captured_queries
+                        if q['sql'].startswith('SELECT') and 'FROM "calories_food"' in q['sql']]
+        self.assertEqual(len(food_lookups), 1)
+    
+    def test_rejects_malformed_payloads(self):
+        """Non-list bodies, empty lists and GETs are refused"""
+        self.assertEqual(self.post({'food_id': self.apple.id}).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        with self.settings(ENTRY_BATCH_MAX_ITEMS=1):
+            self.assertEqual(self.post([{'food_id': self.apple.id}] * 2).status_code, 400)
+        self.assertEqual(CalorieEntry.objects.count(), 0)
+
+class ExportHistoryTests(TestCase):
+    """Test the streaming history export"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('exportuser', password='testpass123')
+        self.client.login(username='exportuser', password='testpass123')
+        self.apple = Food.objects.create(name='Apple, raw', serving='1 medium', calories_per_serving=95)
+        CalorieEntry.objects.bulk_create([
+            CalorieEntry(user=self.user, food=self.apple, quantity=2, date=date.today() - timedelta(days=i))
+            for i in range(3000)
+        ])
+        self.url = reverse('export_history')
+    
+    def test_csv_streams_every_entry_in_one_query(self):
+        """Rows are read in chunks over a single joined query"""
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="calorie-history-', response['Content-Disposition'])
+        
+        with CaptureQueriesContext(connection) as queries:
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('INNER JOIN "calories_food"', queries[0]['sql'])
+        
+        self.assertEqual(lines[0], 'date,time_added,food,serving,quantity,calories_per_serving,calories')
+        self.assertEqual(len(lines), 3001)
+        self.assertTrue(lines[1].startswith((date.today() - timedelta(days=2999)).isoformat()))
+        self.assertTrue(lines[1].endswith(',"Apple, raw",1 medium,2.00,95,190'))
+    
+    def test_gzipped_ndjson(self):
+        """NDJSON can be downloaded gzip-compressed"""
+        response = self.client.get(self.url, {'format': 'ndjson', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 3000)
+        self.assertEqual(json.loads(lines[-1])['calories'], 190)
+        self.assertEqual(json.loads(lines[-1])['date'], date.today().isoformat())
+    
+    def test_unknown_format_rejected(self):
+        """Only CSV and NDJSON are offered"""
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+    
+    async def test_asgi_streams_asynchronously(self):
+        """Under ASGI the export is an async iterator, not buffered"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url, {'format': 'csv'})
+        self.assertTrue(response.is_async)
+        
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 3001)
+
+class ImportHistoryTests(TestCase):
+    """Test the CSV history import"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('importuser', password='testpass123')
+        self.client.login(username='importuser', password='testpass123')
+        self.apple = Food.objects.create(name='Apple', serving='1 medium', calories_per_serving=95)
+        self.rice = Food.objects.create(name='Brown  Rice', serving='1 cup', calories_per_serving=200)
+    
+    def upload(self, content, name='history.csv'):
+        return self.client.post(
+            reverse('import_history'),
+            {'file': SimpleUploadedFile(name, content)}
+        )
+    
+    def test_upload_imports_and_reports_problems(self):
+        """Names resolve case-insensitively; bad rows are reported"""
+        response = self.upload(
+            b'Date,Food,Quantity\n'
+            b'2024-01-01,apple,2\n'
+            b'2024-01-01,brown rice,\n'
+            b'2024-01-02,Dragonfruit,1\n'
+            b'01/03/2024,Apple,1\n'
+            b'2024-01-03,Apple,-1\n'
+        )
+        
+        report = response.context['report']
+        self.assertEqual((report['created'], report['unresolved'], report['invalid']), (2, 1, 2))
+        self.assertEqual(report['problems'][0], {'line': 4, 'food': 'Dragonfruit', 'error': 'Food not found in the catalog'})
+        self.assertEqual(DailyTotal.objects.get(user=self.user, date=date(2024, 1, 1)).calories, 390)
+    
+    def test_export_round_trip(self):
+        """A gzipped export can be imported back"""
+        CalorieEntry.objects.create(user=self.user, food=self.apple, quantity=Decimal('1.5'), date=date(2024, 5, 1))
+        export = b''.join(self.client.get(reverse('export_history'), {'gzip': '1'}).streaming_content)
+        CalorieEntry.objects.all().delete()
+        
+        report = self.upload(export, 'calorie-history.csv.gz').context['report']
+        self.assertEqual(report['created'], 1)
+        entry = CalorieEntry.objects.get(user=self.user)
+        self.assertEqual((entry.food, entry.quantity, entry.date), (self.apple, Decimal('1.50'), date(2024, 5, 1)))
+    
+    def test_command_imports_in_batches(self):
+        """The management command inserts in bulk and keeps totals consistent"""
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        start = date(2023, 1, 1)
+        with os.fdopen(handle, 'w', encoding='utf-8') as csv_file:
+            csv_file.write('date,food,quantity\n')
+            for i in range(1000):
+                csv_file.write(f'{start + timedelta(days=i % 400)},Apple,1\n')
+        
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_history', 'importuser', path, batch_size=100, stdout=out)
+        
+        self.assertIn('Imported 1000 entries', out.getvalue())
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "calories_calorieentry"')]
+        self.assertEqual(len(inserts), 10)
+        self.assertEqual(DailyTotal.objects.filter(user=self.user).count(), 400)
+        self.assertEqual(sum(DailyTotal.objects.values_list('calories', flat=True)), 95000)
+    
+    def test_names_resolve_against_current_catalog(self):
+        """Foods added since the cached index was built are still found"""
+        get_index()
+        # bulk_create sends no signal, so the cached index misses this food
+        Food.objects.bulk_create([Food(name='Kiwi', serving='1 fruit', calories_per_serving=42)])
+        
+        report = self.upload(b'date,food\n2024-01-01,Kiwi\n').context['report']
+        self.assertEqual((report['created'], report['unresolved']), (1, 0))
+    
+    def test_missing_columns_rejected(self):
+        """A file without date and food columns is refused"""
+        response = self.upload(b'when,what\n2024-01-01,Apple\n')
+        self.assertIsNone(response.context['report'])
+        self.assertEqual(CalorieEntry.objects.count(), 0)
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0)
+class RequestTimingTests(TestCase):
+    """Test the Server-Timing middleware"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('timinguser', password='testpass123')
+        self.client.login(username='timinguser', password='testpass123')
+    
+    def test_reports_db_view_and_render_time(self):
+        """Template views get every phase in the header"""
+        response = self.client.get(reverse('dashboard'))
+        
+        header = response['Server-Timing']
+        for name in ('db;dur=', 'view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(name, header)
+        self.assertRegex(header, r'desc="[1-9][0-9]* queries"')
+    
+    async def test_async_views_are_timed(self):
+        """Under ASGI the queries of async views are still counted"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('weekly_report'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9][0-9]* queries"')
+        self.assertIn('render;dur=', response['Server-Timing'])
+    
+    def test_sample_rate_zero_disables_timing(self):
+        """Unsampled requests carry no header"""
+        with self.settings(REQUEST_TIMING_SAMPLE_RATE=0):
+            response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('Server-Timing', response)
+    
+    def test_sampled_requests_log_at_info(self):
+        """Every sampled request gets a line at a level the configured loggers emit"""
+        with self.settings(REQUEST_TIMING_SLOW_MS=60000):
+            with self.assertLogs('calories.middleware', 'INFO') as logs:
+                self.client.get(reverse('weekly_report'))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(logs.records[0].request_timing['path'], '/weekly-report/')
+    
+    def test_slow_requests_log_a_warning(self):
+        """Requests over the threshold are logged with their metrics"""
+        with self.settings(REQUEST_TIMING_SLOW_MS=0):
+            with self.assertLogs('calories.middleware', 'WARNING') as logs:
+                self.client.get(reverse('weekly_report'))
+        self.assertIn('path=/weekly-report/', logs.output[0])
+        self.assertIn('queries=', logs.output[0])
+
+class SetupTestDataTests(TestCase):
+    """Test the synthetic data generator"""
+    
+    def setUp(self):
+        for i in range(10):
+            Food.objects.create(name=f'Food {i}', serving='1 serving', calories_per_serving=100 + i)
+    
+    def generate(self, **options):
+        call_command('setup_test_data', seed=7, days=5, entries_per_day=3, stdout=StringIO(), **options)
+        return sorted(
+            CalorieEntry.objects.values_list('user__username', 'food__name', 'date', 'quantity')
+        )
+    
+    def test_generates_users_entries_and_rollup(self):
+        """Every generated user gets a profile, entries and daily totals"""
+        self.generate(users=2, username='load')
+        
+        self.assertEqual(User.objects.filter(username__in=['load1', 'load2']).count(), 2)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='load').count(), 2)
+        self.assertEqual(CalorieEntry.objects.count(), 2 * 5 * 3)
+        self.assertEqual(DailyTotal.objects.count(), 2 * 5)
+        self.assertEqual(sum(DailyTotal.objects.values_list('entry_count', flat=True)), 30)
+    
+    def test_same_seed_gives_same_data(self):
+        """Rerunning with a seed reproduces the data and adds no duplicates"""
+        first = self.generate(users=3, username='load')
+        self.assertEqual(self.generate(users=3, username='load'), first)
+        
+        CalorieEntry.objects.all().delete()
+        self.assertEqual(self.generate(users=3, username='load'), first)
+
+class BenchCommandTests(TestCase):
+    """Smoke test the benchmark command"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+    
+    def test_bench_reports_every_view(self):
+        """Every named URL gets latency and query numbers"""
+        out = StringIO()
+        call_command(
+            'bench', users=1, days=3, foods=10, iterations=2, no_isolate=True, stdout=out
+        )
+        
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['scale']['days'], 3)
+        for name in ('dashboard', 'calorie_history', 'edit_entry', 'food_search_api'):
+            self.assertEqual(report['views'][name]['status'], 200)
+            self.assertGreater(report['views'][name]['queries'], 0)
+            self.assertIn('p95_ms', report['views'][name])
+        self.assertIn('skipped', report['views']['batch_entries_api'])
+        self.assertIn('p95_ms', report['views']['export_history'])
+    
+    def test_bench_fails_on_error_status(self):
+        """A view that errors aborts the run instead of being timed"""
+        client_get = Client.get
+        
+        def get(client, path, *args, **kwargs):
+            if path == reverse('yearly_report'):
+                return HttpResponse(status=500)
+            return client_get(client, path, *args, **kwargs)
+        
+        with mock.patch.object(Client, 'get', get):
+            with self.assertRaisesMessage(CommandError, 'yearly_report'):
+                call_command(
+                    'bench', users=1, days=1, foods=5, iterations=1, no_isolate=True, stdout=StringIO()
+                )
+
+class RemoteFoodSelectTests(TestCase):
+    """Test the lazy food select on CalorieEntryForm"""
+    
+    def setUp(self):
+        Food.objects.bulk_create(
+            Food(name=f'Catalog Food {i}', serving='1 serving', calories_per_serving=i)
+            for i in range(50)
+        )
+        self.food = Food.objects.create(name='Picked Food', serving='1 bowl', calories_per_serving=321)
+    
+    def test_unbound_form_renders_no_catalog(self):
+        """A blank form renders only the empty choice without any query"""
+        form = CalorieEntryForm()
+        with self.assertNumQueries(0):
+            html = str(form['food'])
+        self.assertEqual(html.count('<option'), 1)
+        self.assertIn('data-search-url="%s"' % reverse('food_search_api'), html)
+    
+    def test_selected_food_rendered(self):
+        """The selected food is the only real option"""
+        form = CalorieEntryForm(data={'food': self.food.id, 'quantity': 1, 'date': date.today()})
+        with self.assertNumQueries(1):
+            html = str(form['food'])
+        self.assertEqual(html.count('<option'), 2)
+        self.assertIn('Picked Food - 321 cal', html)
+        self.assertNotIn('Catalog Food', html)
+    
+    def test_validation_is_single_lookup(self):
+        """Validating the food costs one primary-key query"""
+        form = CalorieEntryForm(data={'food': self.food.id, 'quantity': 1, 'date': date.today()})
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['food'], self.food)
+
+class DashboardCacheTests(TestCase):
+    """Test the per-user dashboard cache"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('cacheuser', password='testpass123')
+        self.food = Food.objects.create(name='Toast', serving='1 slice', calories_per_serving=80)
+        self.client.login(username='cacheuser', password='testpass123')
+    
+    def stats(self):
+        return cache_stats().get('dashboard', {})
+    
+    def test_second_load_is_a_hit(self):
+        """Reloading the dashboard reuses the cached context"""
+        before = self.stats()
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(reverse('dashboard'))
+        after = self.stats()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(after.get('miss', 0) - before.get('miss', 0), 1)
+        self.assertEqual(after.get('hit', 0) - before.get('hit', 0), 1)
+        self.assertLess(len(second), len(first))
+    
+    def test_entry_write_invalidates(self):
+        """Adding, editing and deleting entries refresh the dashboard"""
+        self.client.get(reverse('dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = CalorieEntry.objects.create(user=self.user, food=self.food, quantity=2)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['today_calories'], 160)
+        
+        entry.delete()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['today_calories'], 0)
+    
+    def test_profile_change_invalidates(self):
+        """Changing the goal refreshes the dashboard"""
+        self.client.get(reverse('dashboard'))
+        self.client.post(reverse('profile_settings'), {'daily_calorie_goal': 2500})
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['calorie_goal'], 2500)
+    
+    def test_stampede_guard_waits_for_recompute(self):
+        """Callers that lose the lock wait for the winner's value"""
+        cache.add('stampede:key:lock', 1, 10)
+        threading.Timer(0.1, cache.set, args=('stampede:key', 'fresh', 60)).start()
+        
+        computed = []
+        value = get_or_compute('stampede', 'stampede:key', lambda: computed.append(1), timeout=60)
+        
+        self.assertEqual(value, 'fresh')
+        self.assertEqual(computed, [])
+        self.assertEqual(cache_stats()['stampede']['wait_hit'], 1)
+
+    def test_user_namespace_bump_retires_keys(self):
+        """Bumping a user's namespace changes all its keys and nothing else"""
+        key = user_key(self.user.pk, 'dashboard', '2024-01-01')
+        pages = get_user_version(self.user.pk)
+        self.assertEqual(user_key(self.user.pk, 'dashboard', '2024-01-01'), key)
+        
+        bump_user_version(self.user.pk, 'dashboard')
+        self.assertNotEqual(user_key(self.user.pk, 'dashboard', '2024-01-01'), key)
+        self.assertEqual(get_user_version(self.user.pk), pages)
+    
+    def test_early_recompute(self):
+        """A value at its expiry is refreshed by one reader while the others keep the current one"""
+        get_or_compute('early', 'early:key', lambda: 'first', timeout=60)
+        expiring = cache.get('early:key')._replace(expires=time.time())
+        
+        cache.set('early:key', expiring, 60)
+        cache.add('early:key:lock', 1, 10)
+        self.assertEqual(get_or_compute('early', 'early:key', lambda: 'second', timeout=60), 'first')
+        
+        cache.delete('early:key:lock')
+        self.assertEqual(get_or_compute('early', 'early:key', lambda: 'third', timeout=60), 'third')
+        self.assertEqual(cache.get('early:key').value, 'third')
+        self.assertEqual(cache_stats()['early']['early'], 1)
+        
+        # Values that never expire are never refreshed early
+        get_or_compute('early', 'early:forever', lambda: 'kept', timeout=None)
+        self.assertEqual(get_or_compute('early', 'early:forever', lambda: 'new', timeout=None), 'kept')
+
+class ReportTests(TestCase):
+    """Test the monthly and yearly reports and their caching"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('reportuser', password='testpass123')
+        self.client.login(username='reportuser', password='testpass123')
+        self.food = Food.objects.create(name='Oats', serving='1 cup', calories_per_serving=300)
+        self.last_year = date.today().year - 1
+    
+    def log(self, day, quantity=1):
+        return CalorieEntry.objects.create(user=self.user, food=self.food, quantity=quantity, date=day)
+    
+    def test_month_report_totals(self):
+        """Days are filled in and summed from the rollup"""
+        self.log(date(self.last_year, 2, 3))
+        self.log(date(self.last_year, 2, 3), quantity=2)
+        self.log(date(self.last_year, 2, 20))
+        self.log(date(self.last_year, 3, 1))
+        
+        report = get_month_report(self.user, self.last_year, 2)
+        self.assertEqual(len(report['days']), 28 if report['end'].day == 28 else 29)
+        self.assertEqual(report['days'][date(self.last_year, 2, 3)], 900)
+        self.assertEqual(report['total_calories'], 1200)
+        self.assertEqual(report['days_logged'], 2)
+    
+    def test_closed_periods_are_cached_until_changed(self):
+        """Past months and years are computed once, then recomputed after a back-dated write"""
+        day = date(self.last_year, 6, 15)
+        self.log(day)
+        get_month_report(self.user, self.last_year, 6)
+        get_year_report(self.user, self.last_year)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_month_report(self.user, self.last_year, 6)['total_calories'], 300)
+            self.assertEqual(get_year_report(self.user, self.last_year)['total_calories'], 300)
+        
+        entry = self.log(day + timedelta(days=1))
+        self.assertEqual(get_month_report(self.user, self.last_year, 6)['total_calories'], 600)
+        self.assertEqual(get_year_report(self.user, self.last_year)['months'][5]['days_logged'], 2)
+        
+        entry.delete()
+        self.assertEqual(get_year_report(self.user, self.last_year)['total_calories'], 300)
+    
+    def test_current_period_is_not_cached(self):
+        """The running month and year always reflect today's entries"""
+        today = date.today()
+        get_month_report(self.user, today.year, today.month)
+        get_year_report(self.user, today.year)
+        DailyTotal.objects.create(user=self.user, date=today, calories=500, entry_count=1)
+        self.assertEqual(get_month_report(self.user, today.year, today.month)['total_calories'], 500)
+        self.assertEqual(get_year_report(self.user, today.year)['total_calories'], 500)
+    
+    def test_year_report_is_one_grouped_query(self):
+        """A year costs a single query over the rollup, grouped by month"""
+        for month in range(1, 13):
+            self.log(date(self.last_year, month, 10))
+            self.log(date(self.last_year, month, 11))
+        with self.assertNumQueries(1):
+            report = get_year_report(self.user, self.last_year)
+        self.assertEqual([row['days_logged'] for row in report['months']], [2] * 12)
+        self.assertEqual(report['total_calories'], 24 * 300)
+    
+    def test_report_views(self):
+        """Both views render and fall back to the current period on bad input"""
+        self.log(date(self.last_year, 4, 2))
+        response = self.client.get(reverse('monthly_report'), {'month': f'{self.last_year}-04'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_calories'], 300)
+        self.assertEqual(response.context['next_month'], date(self.last_year, 5, 1))
+        
+        response = self.client.get(reverse('monthly_report'), {'month': 'nope'})
+        self.assertEqual(response.context['month_start'], date.today().replace(day=1))
+        self.assertIsNone(response.context['next_month'])
+        
+        response = self.client.get(reverse('yearly_report'), {'year': self.last_year})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['months'][3]['calories'], 300)
+        self.assertEqual(response.context['next_year'], self.last_year + 1)
+        
+        response = self.client.get(reverse('yearly_report'), {'year': '99999'})
+        self.assertEqual(response.context['year'], date.today().year)
+
+class ConditionalGetTests(TestCase):
+    """Test 304 responses for the per-user pages"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('etaguser', password='testpass123')
+        self.food = Food.objects.create(name='Toast', serving='1 slice', calories_per_serving=80)
+        self.client.login(username='etaguser', password='testpass123')
+    
+    def revalidate(self, name, **params):
+        first = self.client.get(reverse(name), params)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('no-cache', first['Cache-Control'])
+        second = self.client.get(reverse(name), params, HTTP_IF_NONE_MATCH=first['ETag'])
+        return first, second
+    
+    def test_unchanged_pages_are_not_rendered(self):
+        """A matching validator skips the view and its template"""
+        for name in ('dashboard', 'calorie_history', 'weekly_report'):
+            with self.subTest(name):
+                first, second = self.revalidate(name)
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second.content, b'')
+                self.assertEqual(second.templates, [])
+                self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_entry_and_profile_changes_change_validator(self):
+        """Writes bump the user's version, so old validators stop matching"""
+        first, _ = self.revalidate('dashboard')
+        with self.captureOnCommitCallbacks(execute=True):
+            CalorieEntry.objects.create(user=self.user, food=self.food, quantity=2)
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['today_calories'], 160)
+        
+        etag = response['ETag']
+        profile = UserProfile.objects.get(user=self.user)
+        profile.daily_calorie_goal = 2500
+        profile.save()
+        response = self.client.get(reverse('weekly_report'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_catalog_changes_change_validator(self):
+        """Renaming a food shown on the page makes old validators stop matching"""
+        CalorieEntry.objects.create(user=self.user, food=self.food, quantity=1)
+        for name in ('dashboard', 'calorie_history'):
+            with self.subTest(name):
+                first, _ = self.revalidate(name)
+                self.food.name = f'Rye Toast {name}'
+                self.food.save()
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, f'Rye Toast {name}')
+    
+    def test_validator_covers_query_string(self):
+        """Another history page has its own validator"""
+        first, _ = self.revalidate('calorie_history')
+        response = self.client.get(reverse('calorie_history'), {'cursor': 'x'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertNotEqual(response.status_code, 304)
+    
+    def test_pending_messages_disable_304(self):
+        """A page with a queued flash message is always rendered"""
+        first, _ = self.revalidate('dashboard')
+        version = cache.get(f'user_version:{self.user.pk}')
+        response = self.client.post(reverse('profile_settings'), {'daily_calorie_goal': 2000})
+        self.assertEqual(response.status_code, 302)
+        # Undo the bump from saving the profile, so only the message differs
+        cache.set(f'user_version:{self.user.pk}', version, None)
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Profile updated successfully!')
+
+class RecentFoodsTests(TestCase):
+    """Test the recent and frequent foods and their per-user cache"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('recentuser', password='testpass123')
+        forget(self.user.pk)
+        self.addCleanup(forget, self.user.pk)
+        self.apple = Food.objects.create(name='Apple', serving='1 medium', calories_per_serving=95)
+        self.rice = Food.objects.create(name='Rice', serving='1 cup', calories_per_serving=200)
+        self.oats = Food.objects.create(name='Oats', serving='1 cup', calories_per_serving=300)
+    
+    def log(self, food, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return CalorieEntry.objects.create(
+                user=self.user, food=food, date=date.today() - timedelta(days=days_ago)
+            )
+    
+    def names(self, foods):
+        return [food['name'] for food in foods]
+    
+    def test_recent_and_frequent_from_one_query(self):
+        """Recent is by last added, frequent by use count; old history is ignored"""
+        for days_ago in (3, 2, 1):
+            self.log(self.rice, days_ago)
+        self.log(self.apple)
+        self.log(self.oats, days_ago=400)
+        
+        with self.assertNumQueries(1):
+            foods = recent_foods(self.user.pk)
+        self.assertEqual(self.names(foods['recent']), ['Apple', 'Rice'])
+        self.assertEqual(self.names(foods['frequent']), ['Rice', 'Apple'])
+        self.assertEqual(foods['frequent'][0]['uses'], 3)
+        
+        with self.assertNumQueries(0):
+            recent_foods(self.user.pk)
+    
+    def test_new_entries_update_cache_in_place(self):
+        """Adding entries refreshes the cached lists without a query"""
+        self.log(self.rice)
+        recent_foods(self.user.pk)
+        
+        self.log(self.oats)
+        self.log(self.oats)
+        with self.assertNumQueries(0):
+            foods = recent_foods(self.user.pk)
+        self.assertEqual(self.names(foods['recent']), ['Oats', 'Rice'])
+        self.assertEqual(foods['frequent'][0]['uses'], 2)
+    
+    def test_edits_and_deletes_drop_cache(self):
+        """Any change other than new entries recomputes on the next read"""
+        entry = self.log(self.rice)
+        recent_foods(self.user.pk)
+        
+        entry.food = self.apple
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(recent_foods(self.user.pk)['recent']), ['Apple'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertEqual(recent_foods(self.user.pk), {'recent': [], 'frequent': []})
+    
+    def test_api(self):
+        """The endpoint returns both lists as JSON"""
+        self.log(self.apple)
+        self.client.login(username='recentuser', password='testpass123')
+        data = self.client.get(reverse('recent_foods_api')).json()
+        self.assertEqual(data['recent'][0]['id'], self.apple.pk)
+        self.assertEqual(data['frequent'][0]['calories'], 95)
+    
+    def test_lru_cache_bounds(self):
+        """The LRU cache evicts the least recently used item and expired ones"""
+        lru = LRUCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        self.assertTrue(lru.update('a', lambda value: value + 1))
+        self.assertFalse(lru.update('b', lambda value: value + 1))
+        self.assertEqual(lru.get('a'), 2)
+        
+        expired = LRUCache(max_size=2, ttl=0)
+        expired.set('a', 1)
+        self.assertIsNone(expired.get('a'))
+        self.assertEqual(len(expired), 0)
+
+class SqliteTunedProfileTests(TestCase):
+    """Test the opt-in SQLite connection profile"""
+    
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_profile_applies_pragmas_and_immediate_transactions(self):
+        """New connections switch to WAL and tuned pragmas and begin transactions IMMEDIATE"""
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'tuned.sqlite3'),
+            'OPTIONS': settings.SQLITE_TUNED_OPTIONS,
+        }, alias='tuned')
+        self.addCleanup(wrapper.close)
+        
+        with wrapper.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size')
+            }
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'busy_timeout': 20000,
+            'cache_size': -65536,
+        })
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+class SQLiteCacheTests(TestCase):
+    """Test the SQLite-file cache shared by worker processes"""
+    
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+        # Another worker's view of the same file
+        self.other = SQLiteCache(self.path, {})
+    
+    def test_workers_share_values(self):
+        """A value set by one worker is read and deleted by another"""
+        self.cache.set('report', {'total': 300}, 60)
+        self.assertEqual(self.other.get('report'), {'total': 300})
+        self.assertEqual(self.other.get_many(['report', 'missing']), {'report': {'total': 300}})
+        self.assertTrue(self.other.delete('report'))
+        self.assertIsNone(self.cache.get('report'))
+    
+    def test_add_is_exclusive_until_expiry(self):
+        """Only one worker gets a lock; an expired one can be taken again"""
+        self.assertTrue(self.cache.add('lock', 1, 60))
+        self.assertFalse(self.other.add('lock', 2, 60))
+        self.assertEqual(self.cache.get('lock'), 1)
+        
+        self.assertTrue(self.cache.add('brief', 1, 0.05))
+        time.sleep(0.1)
+        self.assertIsNone(self.other.get('brief'))
+        self.assertTrue(self.other.add('brief', 2, 60))
+        self.assertEqual(self.cache.get('brief'), 2)
+    
+    def test_cull_drops_soonest_expiring(self):
+        """Past MAX_ENTRIES the rows expiring soonest go first"""
+        small = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_EVERY': 5}})
+        small.set('forever', 1, None)
+        for i in range(29):
+            small.set(f'key{i}', i, 60 + i)
+        
+        self.assertLessEqual(self.rows(), 10)
+        self.assertEqual(small.get('forever'), 1)
+        self.assertEqual(small.get('key28'), 28)
+        self.assertIsNone(small.get('key0'))
+    
+    def test_cull_counts_writes_across_instances(self):
+        """Under ASGI each request gets its own backend; culling still happens and connections are reused"""
+        options = {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_EVERY': 5}}
+        for i in range(30):
+            SQLiteCache(self.path, options).set(f'key{i}', i, 60 + i)
+        
+        self.assertLessEqual(self.rows(), 10)
+        self.assertEqual(SQLiteCache(self.path, options).get('key29'), 29)
+        self.assertEqual(len(sqlite_cache._pools[self.path][1]), 1)
+    
+    def rows(self):
+        return self.cache._fetch('SELECT COUNT(*) FROM cache')[0][0]
+
+class ReplicaRouterTests(TestCase):
+    """Test read-replica routing and the read-your-writes pin"""
+    
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.user = User.objects.create_user(username='replicauser', password='testpass123')
+        self.food = Food.objects.create(name='Replica Apple', serving='1 medium', calories_per_serving=95)
+        self.client.login(username='replicauser', password='testpass123')
+    
+    def routed_view(self, seen):
+        """A replica view recording where entry and session reads would go"""
+        def view(request):
+            seen.append((self.router.db_for_read(CalorieEntry), self.router.db_for_read(Session)))
+            return HttpResponse()
+        return read_from_replica(view)
+    
+    def request(self, method='get', session=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.session = session if session is not None else SessionStore()
+        return request
+    
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_replica_views_read_from_a_replica(self):
+        """GETs in replica views read from a replica; sessions, writes and other views use the primary"""
+        seen = []
+        view = self.routed_view(seen)
+        view(self.request())
+        view(self.request('post'))
+        
+        self.assertEqual(seen, [('replica', None), (None, None)])
+        self.assertIsNone(self.router.db_for_read(CalorieEntry))
+        self.assertEqual(self.router.db_for_write(CalorieEntry), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'calories'))
+        self.assertIsNone(self.router.allow_migrate('default', 'calories'))
+    
+    def test_no_replicas_configured(self):
+        """Without DATABASE_REPLICAS every read stays on the primary"""
+        seen = []
+        self.routed_view(seen)(self.request())
+        self.assertEqual(seen, [(None, None)])
+    
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_async_view_routes_reads_in_orm_thread(self):
+        """The replica scope follows async views into sync_to_async"""
+        seen = []
+        
+        async def view(request):
+            seen.append(await sync_to_async(self.router.db_for_read)(CalorieEntry))
+            return HttpResponse()
+        
+        async_to_sync(read_from_replica(view))(self.request())
+        self.assertEqual(seen, ['replica'])
+    
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_write_pins_reads_to_primary(self):
+        """After a POST the user's replica views read from the primary for REPLICA_PIN_SECONDS"""
+        self.client.get(reverse('dashboard'))
+        self.assertNotIn(PIN_SESSION_KEY, self.client.session)
+        
+        response = self.client.post(reverse('add_entry'), {
+            'food': self.food.id,
+            'quantity': '1.00',
+            'date': date.today().isoformat()
+        })
+        self.assertEqual(response.status_code, 302)
+        session = self.client.session
+        self.assertGreater(session[PIN_SESSION_KEY], time.time())
+        
+        seen = []
+        self.routed_view(seen)(self.request(session=session))
+        self.assertEqual(seen, [(None, None)])
+        
+        with override_settings(REPLICA_PIN_SECONDS=-1):
+            self.client.post(reverse('add_entry'), {
+                'food': self.food.id,
+                'quantity': '1.00',
+                'date': date.today().isoformat()
+            })
+        self.routed_view(seen)(self.request(session=self.client.session))
+        self.assertEqual(seen[-1], ('replica', None))
+    
+    def test_no_pin_without_replicas(self):
+        """Writes do not touch the session when no replicas are configured"""
+        self.client.post(reverse('add_entry'), {
+            'food': self.food.id,
+            'quantity': '1.00',
+            'date': date.today().isoformat()
+        })
+        self.assertNotIn(PIN_SESSION_KEY, self.client.session)
+    
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_cached_reports_are_computed_on_primary(self):
+        """Closed-period reports, which are cached for good, never read a replica"""
+        seen = []
+        
+        def view(request):
+            with primary_reads():
+                seen.append(self.router.db_for_read(CalorieEntry))
+            # The alias does not exist here, so a replica read would raise
+            report = get_month_report(self.user, date.today().year - 1, 1)
+            seen.append(report['total_calories'])
+            return HttpResponse()
+        
+        cache.clear()
+        self.addCleanup(cache.clear)
+        read_from_replica(view)(self.request())
+        self.assertEqual(seen, [None, 0])
+    
+    def test_replica_pages_get_no_etag(self):
+        """A page rendered from a replica gets no validator, one from the primary does"""
+        view = conditional_page(read_from_replica(lambda request: HttpResponse()))
+        
+        def get():
+            request = self.request()
+            request.user = self.user
+            request._messages = default_storage(request)
+            return view(request)
+        
+        self.assertTrue(get().has_header('ETag'))
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            self.assertFalse(get().has_header('ETag'))
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the calorie history"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('pageuser', password='testpass123')
+        food = Food.objects.create(name='Soup', serving='1 bowl', calories_per_serving=150)
+        for i in range(40):
+            CalorieEntry.objects.create(
+                user=self.user,
+                food=food,
+                quantity=1,
+                date=date.today() - timedelta(days=i // 3)
+            )
+        self.expected = list(CalorieEntry.objects.filter(user=self.user).order_by(
+            '-date', '-time_added', '-id'
+        ).values_list('id', flat=True))
+        self.client.login(username='pageuser', password='testpass123')
+    
+    def test_walk_forward_and_back(self):
+        """Following next and previous cursors visits every entry once"""
+        seen = []
+        response = self.client.get(reverse('calorie_history'))
+        while True:
+            page = response.context['page']
+            seen.extend(entry.id for entry in page)
+            if not page.has_next:
+                break
+            response = self.client.get(reverse('calorie_history'), {'cursor': page.next_cursor})
+        
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(response.context['total_entries'])
+        
+        response = self.client.get(reverse('calorie_history'), {'cursor': page.previous_cursor})
+        self.assertEqual([entry.id for entry in response.context['page']], self.expected[15:30])
+    
+    def test_total_is_opt_in(self):
+        """The total needs ?count=1; plain pages skip the aggregate"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('calorie_history'))
+        self.assertIsNone(response.context['total_entries'])
+        self.assertFalse([q for q in queries if 'SUM("calories_dailytotal"."entry_count")' in q['sql']])
+        self.assertContains(response, 'count=1')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('calorie_history'), {'count': '1'})
+        self.assertEqual(response.context['total_entries'], 40)
+        self.assertTrue([q for q in queries if 'SUM("calories_dailytotal"."entry_count")' in q['sql']])
+        self.assertContains(response, 'of 40 entries')
+    
+    def test_pages_do_not_count(self):
+        """Deep pages use neither COUNT over entries nor OFFSET"""
+        response = self.client.get(reverse('calorie_history'))
+        cursor = response.context['page'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('calorie_history'), {'cursor': cursor})
+        entry_sql = [q['sql'] for q in queries if 'calories_calorieentry' in q['sql']]
+        self.assertEqual(len(entry_sql), 1)
+        self.assertNotIn('COUNT(', entry_sql[0])
+        self.assertNotIn('OFFSET', entry_sql[0])
+    
+    def test_tampered_cursor_shows_first_page(self):
+        """An invalid cursor falls back to the newest entries"""
+        response = self.client.get(reverse('calorie_history'), {'cursor': 'not-a-cursor'})
+        self.assertEqual([entry.id for entry in response.context['page']], self.expected[:15])
+
+class QueryPlanTests(TestCase):
+    """Check the hot views' queries are served by indexes, not table scans"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('planuser', password='testpass123')
+        food = Food.objects.create(name='Bagel', serving='1 bagel', calories_per_serving=250)
+        for i in range(20):
+            CalorieEntry.objects.create(
+                user=self.user,
+                food=food,
+                quantity=1,
+                date=date.today() - timedelta(days=i)
+            )
+        self.client.login(username='planuser', password='testpass123')
+    
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables make a seq scan cheapest; force the planner
+                # to show whether an index path exists at all
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    
+    def app_queries(self, url, params=None):
+        """SELECTs against this app's tables issued while serving ``url``"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return [
+            q['sql'] for q in queries
+            if q['sql'].startswith('SELECT') and 'calories_' in q['sql']
+        ]
+    
+    def assertNoFullScans(self, url, params=None):
+        queries = self.app_queries(url, params)
+        self.assertTrue(queries)
+        for sql in queries:
+            plan = self.explain(sql)
+            self.assertNotRegex(plan, r'Seq Scan on calories_', msg=sql)
+            # Even SCAN ... USING (COVERING) INDEX reads the whole index
+            self.assertNotRegex(plan, r'\bSCAN calories_', msg=sql)
+            self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan, msg=sql)
+            if '"user_id" = ' in sql:
+                # One user's rows must be found by an index lookup on user_id
+                self.assertRegex(
+                    plan,
+                    r'Index Cond: .*user_id' if connection.vendor == 'postgresql'
+                    else r'\bSEARCH calories_\w+ USING .*\(user_id=',
+                    msg=sql
+                )
+    
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'plan format not supported')
+    def test_dashboard_uses_indexes(self):
+        self.assertNoFullScans(reverse('dashboard'))
+    
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'plan format not supported')
+    def test_history_uses_indexes(self):
+        self.assertNoFullScans(reverse('calorie_history'))
+        cursor = self.client.get(reverse('calorie_history')).context['page'].next_cursor
+        self.assertNoFullScans(reverse('calorie_history'), {'cursor': cursor})
+    
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'plan format not supported')
+    def test_weekly_report_uses_indexes(self):
+        self.assertNoFullScans(reverse('weekly_report'))
+    
+    def test_search_does_not_query_catalog(self):
+        get_index()
+        self.assertEqual(self.app_queries(reverse('food_search_api'), {'q': 'bag'}), [])
+
 def run_manual_tests():
     """Manual test checklist - not automated"""
     checklist = [
@@ -12,8 +12,12 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('add/', views.add_calorie_entry, name='add_entry'),
     path('history/', views.calorie_history, name='calorie_history'),
+    path('history/export/', views.export_history, name='export_history'),
+    path('history/import/', views.import_history_view, name='import_history'),
     path('profile/', views.profile_settings, name='profile_settings'),
     path('weekly-report/', views.weekly_report, name='weekly_report'),
+    path('monthly-report/', views.monthly_report, name='monthly_report'),
+    path('yearly-report/', views.yearly_report, name='yearly_report'),
     
     # CRUD operations for entries
     path('edit/<int:entry_id>/', views.edit_entry, name='edit_entry'),
@@ -21,4 +25,8 @@ urlpatterns = [
     
     # API endpoints
     path('api/search-food/', views.food_search_api, name='food_search_api'),
+    path('api/foods/catalog/', views.food_catalog_api, name='food_catalog_api'),
+    path('api/foods/recent/', views.recent_foods_api, name='recent_foods_api'),
+    path('api/entries/batch/', views.batch_entries_api, name='batch_entries_api'),
+    path('api/cache-stats/', views.cache_stats_api, name='cache_stats_api'),
 ]
\ No newline at end of file
@@ -1,6 +1,8 @@
+import calendar
 from datetime import date, timedelta
-from django.db.models import Sum
-from .models import CalorieEntry
+from .cache import get_or_compute, report_key
+from .models import DailyTotal
+from .routers import primary_reads
 
 def get_daily_calories(user, target_date=None):
     """
@@ -9,14 +11,7 @@ def get_daily_calories(user, target_date=None):
     if target_date is None:
         target_date = date.today()
     
-    total = CalorieEntry.objects.filter(
-        user=user,
-        date=target_date
-    ).aggregate(
-        total_calories=Sum('food__calories_per_serving')
-    )['total_calories']
-    
-    return total or 0
+    return DailyTotal.objects.total_between(user, target_date, target_date)
 
 def get_weekly_calories(user, week_start=None):
     """
@@ -28,14 +23,7 @@ def get_weekly_calories(user, week_start=None):
     
     week_end = week_start + timedelta(days=6)
     
-    total = CalorieEntry.objects.filter(
-        user=user,
-        date__range=[week_start, week_end]
-    ).aggregate(
-        total_calories=Sum('food__calories_per_serving')
-    )['total_calories']
-    
-    return total or 0
+    return DailyTotal.objects.total_between(user, week_start, week_end)
 
 def get_monthly_calories(user, year=None, month=None):
     """
@@ -46,41 +34,84 @@ def get_monthly_calories(user, year=None, month=None):
         year = today.year
         month = today.month
     
-    total = CalorieEntry.objects.filter(
-        user=user,
-        date__year=year,
-        date__month=month
-    ).aggregate(
-        total_calories=Sum('food__calories_per_serving')
-    )['total_calories']
+    return get_month_report(user, year, month)['total_calories']
+
+def _cached_report(user, period, end, compute):
+    """
+    Periods that ended before today are cached with no expiry: past days
+    only change when an entry is back-dated, edited or deleted, and the
+    ``entries_changed`` receivers drop the key then. The running period is
+    computed fresh; it is a single query over at most a year of rollup rows.
+    Cached reports are computed on the primary: one built from a lagging
+    replica after the invalidation would stay stale for good.
+    """
+    if end >= date.today():
+        return compute()
     
-    return total or 0
+    def compute_on_primary():
+        with primary_reads():
+            return compute()
+    
+    return get_or_compute('report', report_key(user.pk, period), compute_on_primary, timeout=None)
 
-def get_calorie_streak(user):
+def get_month_report(user, year, month):
     """
-    Calculate how many consecutive days the user has met their calorie goal
+    Daily totals for a calendar month: ``{'start', 'end', 'days',
+    'total_calories', 'days_logged'}`` with ``days`` as ``{date: calories}``
+    """
+    start = date(year, month, 1)
+    end = date(year, month, calendar.monthrange(year, month)[1])
+    
+    def compute():
+        days = DailyTotal.objects.daily_totals(user, start, end)
+        return {
+            'start': start,
+            'end': end,
+            'days': days,
+            'total_calories': sum(days.values()),
+            'days_logged': sum(1 for calories in days.values() if calories),
+        }
+    
+    return _cached_report(user, start.strftime('%Y-%m'), end, compute)
+
+def get_year_report(user, year):
     """
-    profile = user.userprofile
-    goal = profile.daily_calorie_goal
+    Monthly totals for a calendar year: ``{'start', 'end', 'months',
+    'total_calories', 'days_logged'}`` with ``months`` holding a
+    ``{'month', 'calories', 'days_logged', 'entry_count'}`` dict for each
+    of the twelve months
+    """
+    start = date(year, 1, 1)
+    end = date(year, 12, 31)
     
-    streak = 0
-    current_date = date.today()
+    def compute():
+        totals = DailyTotal.objects.monthly_totals(user, start, end)
+        months = []
+        for month in range(1, 13):
+            first = date(year, month, 1)
+            months.append({
+                'month': first,
+                **totals.get(first, {'calories': 0, 'days_logged': 0, 'entry_count': 0}),
+            })
+        return {
+            'start': start,
+            'end': end,
+            'months': months,
+            'total_calories': sum(row['calories'] for row in months),
+            'days_logged': sum(row['days_logged'] for row in months),
+        }
     
-    while True:
-        daily_calories = get_daily_calories(user, current_date)
-        
-        # Check if goal was met (within reasonable range)
-        if daily_calories >= (goal * 0.8) and daily_calories <= (goal * 1.2):
-            streak += 1
-            current_date -= timedelta(days=1)
-        else:
-            break
-        
-        # Prevent infinite loop - max 365 days
-        if streak >= 365:
-            break
+    return _cached_report(user, str(year), end, compute)
+
+def get_calorie_streak(user):
+    """
+    Calculate how many consecutive days the user has met their calorie goal
+    """
+    today = date.today()
+    streak, last_date = user.userprofile.compute_streak(end=today)
     
-    return streak
+    # The streak only counts if it reaches today
+    return streak if last_date == today else 0
 
 def calculate_bmi(weight_kg, height_cm):
     """
@@ -1,27 +1,47 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.db.models import Sum, Q
+from django.db import transaction
+from django.db.models import Sum
 from django.utils import timezone
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_POST
+from django.template.response import TemplateResponse
 from datetime import date, timedelta
+import csv
 import json
 import logging
+import re
 
-from .models import Food, CalorieEntry, UserProfile
-from .forms import CalorieEntryForm, UserProfileForm
+from .models import Food, CalorieEntry, UserProfile, DailyTotal
+from .forms import BatchEntryItemForm, CalorieEntryForm, HistoryImportForm, UserProfileForm
+from .search import aget_index, asearch_foods
+from .cache import aget_catalog_version, aget_or_compute, auser_key, cache_stats
+from .pagination import KeysetPaginator
+from .conditional import conditional_page
+from .routers import read_from_replica
+from .signals import entries_changed
+from .export import EXPORT_FORMATS, ExportEncoder, astream_export, export_queryset, stream_export
+from .importer import import_history, open_history_file
+from .utils import get_month_report, get_year_report
+from .recent import recent_foods
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
 def home(request):
     """Home page - redirects to dashboard if logged in"""
     if request.user.is_authenticated:
         return redirect('dashboard')
-    return render(request, 'calories/home.html')
+    return TemplateResponse(request, 'calories/home.html')
 
 def register(request):
     """User registration view"""
@@ -41,7 +61,7 @@ def register(request):
                 messages.error(request, 'An error occurred while creating your account. Please try again.')
     else:
         form = UserCreationForm()
-    return render(request, 'registration/register.html', {'form': form})
+    return TemplateResponse(request, 'registration/register.html', {'form': form})
 
 def user_login(request):
     """Custom login view"""
@@ -54,7 +74,7 @@ def user_login(request):
             return redirect('dashboard')
         else:
             messages.error(request, 'Invalid username or password.')
-    return render(request, 'registration/login.html')
+    return TemplateResponse(request, 'registration/login.html')
 
 def user_logout(request):
     """Logout view"""
@@ -62,55 +82,68 @@ def user_logout(request):
     messages.success(request, 'You have been logged out successfully.')
     return redirect('home')
 
-@login_required
-def dashboard(request):
-    """Main dashboard showing today's calories and recent entries"""
-    today = date.today()
-    
+async def abuild_dashboard_context(user, today):
+    """Compute the dashboard context for ``user`` on ``today``"""
     # Get or create user profile
-    profile, created = UserProfile.objects.get_or_create(
-        user=request.user, 
+    profile, created = await UserProfile.objects.aget_or_create(
+        user=user, 
         defaults={'daily_calorie_goal': 2000}
     )
     
     # Get today's calorie entries
-    today_entries = CalorieEntry.objects.filter(
-        user=request.user, 
+    today_entries = [entry async for entry in CalorieEntry.objects.filter(
+        user=user, 
         date=today
-    ).select_related('food')
+    ).select_related('food')]
     
-    # Calculate today's total calories
-    today_calories = sum(entry.total_calories for entry in today_entries)
+    # Last 7 days of totals, today included, from the daily rollup
+    week_totals = await DailyTotal.objects.adaily_totals(
+        user,
+        today - timedelta(days=6),
+        today
+    )
+    today_calories = week_totals[today]
     
     # Calculate remaining calories
     remaining_calories = profile.daily_calorie_goal - today_calories
     
-    # Get last 7 days for chart data
-    week_data = []
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_calories = CalorieEntry.objects.filter(
-            user=request.user, 
-            date=day
-        ).aggregate(
-            total=Sum('food__calories_per_serving')
-        )['total'] or 0
-        week_data.append({
-            'date': day.strftime('%m/%d'),
-            'calories': day_calories
-        })
+    # Chart data for the last 7 days
+    week_data = [
+        {'date': day.strftime('%m/%d'), 'calories': calories}
+        for day, calories in week_totals.items()
+    ]
     
-    context = {
+    streak = await profile.astreak_on(today)
+    
+    return {
         'profile': profile,
         'today_entries': today_entries,
         'today_calories': today_calories,
         'remaining_calories': remaining_calories,
         'calorie_goal': profile.daily_calorie_goal,
         'week_data': json.dumps(week_data),
-        'progress_percentage': min(100, (today_calories / profile.daily_calorie_goal) * 100)
+        'progress_percentage': min(100, (today_calories / profile.daily_calorie_goal) * 100),
+        'streak': streak
     }
+
+@login_required
+@conditional_page
+async def dashboard(request):
+    """Main dashboard showing today's calories and recent entries"""
+    today = date.today()
+    user = await request.auser()
+    
+    # Cached per user and day in the user's dashboard namespace, which entry
+    # and profile writes bump, and per catalog version, since entries show
+    # food names
+    context = await aget_or_compute(
+        'dashboard',
+        await auser_key(user.pk, 'dashboard', today.isoformat(), await aget_catalog_version()),
+        lambda: abuild_dashboard_context(user, today),
+        timeout=settings.DASHBOARD_CACHE_TIMEOUT
+    )
     
-    return render(request, 'calories/dashboard.html', context)
+    return TemplateResponse(request, 'calories/dashboard.html', context)
 
 @login_required
 def add_calorie_entry(request):
@@ -121,7 +154,8 @@ def add_calorie_entry(request):
             try:
                 entry = form.save(commit=False)
                 entry.user = request.user
-                entry.save()
+                with transaction.atomic():
+                    entry.save()
                 messages.success(request, f'Added {entry.food.name} to your daily intake!')
                 return redirect('dashboard')
             except Exception as e:
@@ -130,55 +164,236 @@ def add_calorie_entry(request):
     else:
         form = CalorieEntryForm()
     
-    return render(request, 'calories/add_entry.html', {'form': form})
+    return TemplateResponse(request, 'calories/add_entry.html', {'form': form})
 
 @login_required
-def food_search_api(request):
+@require_POST
+def batch_entries_api(request):
+    """
+    Create many entries from a JSON list of ``{food_id, quantity, date}``
+    items in one request. Valid items are inserted together; each item gets
+    its own result, and the response carries the new totals of every day
+    that changed.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+    
+    items = payload.get('entries') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'Expected a non-empty list of entries'}, status=400)
+    max_items = settings.ENTRY_BATCH_MAX_ITEMS
+    if len(items) > max_items:
+        return JsonResponse({'error': f'At most {max_items} entries per request'}, status=400)
+    
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        form = BatchEntryItemForm(item if isinstance(item, dict) else {})
+        if form.is_valid():
+            valid.append((index, form.cleaned_data))
+        else:
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'errors': {
+                    field: [error['message'] for error in errors]
+                    for field, errors in form.errors.get_json_data().items()
+                }
+            }
+    
+    # One query validates every food id in the batch
+    foods = Food.objects.in_bulk({data['food_id'] for _, data in valid})
+    
+    entries = []
+    for index, data in valid:
+        food = foods.get(data['food_id'])
+        if food is None:
+            results[index] = {'index': index, 'status': 'error', 'errors': {'food_id': ['Unknown food.']}}
+            continue
+        entries.append((index, CalorieEntry(
+            user=request.user, food=food, quantity=data['quantity'], date=data['date']
+        )))
+    
+    daily_totals = {}
+    if entries:
+        try:
+            with transaction.atomic():
+                CalorieEntry.objects.bulk_create([entry for _, entry in entries])
+                # bulk_create skips post_save; refresh the rollup, streak
+                # and dashboard cache for the touched days in one go
+                dates = {entry.date for _, entry in entries}
+                entries_changed.send(
+                    sender=CalorieEntry,
+                    user_id=request.user.pk,
+                    dates=dates,
+                    created=[entry for _, entry in entries]
+                )
+        except Exception as e:
+            logger.error(f'Error adding batch entries for user {request.user.username}: {e}')
+            return JsonResponse({'error': 'Could not save the entries. Please try again.'}, status=500)
+        
+        daily_totals = {day.isoformat(): 0 for day in dates}
+        for day, calories in DailyTotal.objects.filter(
+            user=request.user, date__in=dates
+        ).values_list('date', 'calories'):
+            daily_totals[day.isoformat()] = calories
+    
+    for index, entry in entries:
+        results[index] = {
+            'index': index,
+            'status': 'created',
+            'id': entry.pk,
+            'calories': entry.total_calories,
+        }
+    
+    return JsonResponse({
+        'created': len(entries),
+        'results': results,
+        'daily_totals': daily_totals,
+    }, status=201 if entries else 400)
+
+@login_required
+async def food_search_api(request):
     """API endpoint for food search (AJAX)"""
     query = request.GET.get('q', '')
     if len(query) >= 2:
-        foods = Food.objects.filter(
-            Q(name__icontains=query)
-        )[:10]
-        
-        results = []
-        for food in foods:
-            results.append({
-                'id': food.id,
-                'name': food.name,
-                'serving': food.serving,
-                'calories': food.calories_per_serving
-            })
-        
+        # Served from the in-memory index, ranked by relevance; typos are
+        # only tolerated with ?fuzzy=1, which costs up to
+        # FOOD_SEARCH_FUZZY_BUDGET_MS more
+        fuzzy = request.GET.get('fuzzy') in ('1', 'true')
+        results = await asearch_foods(query, limit=10, fuzzy=fuzzy)
         return JsonResponse({'results': results})
     
     return JsonResponse({'results': []})
 
 @login_required
+def recent_foods_api(request):
+    """The user's most recently added and most frequently logged foods"""
+    foods = recent_foods(request.user.pk)
+    return JsonResponse({
+        kind: [
+            {**food, 'last_used': food['last_used'].isoformat()}
+            for food in foods[kind]
+        ]
+        for kind in ('recent', 'frequent')
+    })
+
+@login_required
+async def food_catalog_api(request):
+    """
+    The whole food catalog as one JSON snapshot for client-side search.
+    It is serialized and gzipped once per catalog version and carries a
+    strong ETag, so clients revalidate with If-None-Match and get a 304
+    until ``load_food_data`` or an admin edit changes the catalog.
+    """
+    snapshot = (await aget_index()).snapshot
+    gzipped = bool(ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')))
+    etag = snapshot.etag(gzipped)
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            snapshot.gzipped if gzipped else snapshot.body,
+            content_type='application/json'
+        )
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+    
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+@login_required
+@conditional_page
+@read_from_replica
 def calorie_history(request):
-    """View calorie history with pagination"""
+    """View calorie history with cursor pagination"""
     entries = CalorieEntry.objects.filter(
         user=request.user
-    ).select_related('food').order_by('-date', '-time_added')
+    ).select_related('food')
     
-    # Pagination
-    paginator = Paginator(entries, 15)  # Show 15 entries per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination: every page costs the same, with no COUNT(*)
+    paginator = KeysetPaginator(entries, ['date', 'time_added', 'id'], 15)
+    page = paginator.get_page(request.GET.get('cursor'))
     
-    # Calculate daily totals for displayed entries
-    daily_totals = {}
-    for entry in page_obj:
-        if entry.date not in daily_totals:
-            daily_totals[entry.date] = 0
-        daily_totals[entry.date] += entry.total_calories
+    # Daily totals for the days shown on this page, from the rollup
+    page_dates = {entry.date for entry in page}
+    daily_totals = dict(DailyTotal.objects.filter(
+        user=request.user,
+        date__in=page_dates
+    ).values_list('date', 'calories'))
+    for entry in page:
+        entry.day_total = daily_totals.get(entry.date, 0)
+    
+    # The total is opt-in (?count=1): even from the rollup it reads every
+    # one of the user's days
+    total_entries = None
+    if request.GET.get('count') == '1':
+        total_entries = DailyTotal.objects.filter(
+            user=request.user
+        ).aggregate(total=Sum('entry_count'))['total'] or 0
     
     context = {
-        'page_obj': page_obj,
-        'daily_totals': daily_totals
+        'page': page,
+        'daily_totals': daily_totals,
+        'total_entries': total_entries
     }
     
-    return render(request, 'calories/history.html', context)
+    return TemplateResponse(request, 'calories/history.html', context)
+
+@login_required
+def export_history(request):
+    """
+    Download the user's whole history as CSV or NDJSON (``?format=``),
+    optionally gzipped (``?gzip=1``). The file is streamed while the
+    entries are read in chunks, so memory does not grow with history size.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unknown format: {export_format}'}, status=400)
+    compress = request.GET.get('gzip') in ('1', 'true')
+    
+    entries = export_queryset(request.user)
+    encoder = ExportEncoder(export_format, compress=compress)
+    # Match the server: a sync iterator under ASGI (or an async one under
+    # WSGI) would be read into memory in full before being sent
+    if isinstance(request, ASGIRequest):
+        content = astream_export(entries, encoder)
+    else:
+        content = stream_export(entries, encoder)
+    
+    filename = f'calorie-history-{date.today().isoformat()}.{export_format}'
+    if compress:
+        response = StreamingHttpResponse(content, content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(content, content_type=f'{EXPORT_FORMATS[export_format]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+def import_history_view(request):
+    """Import entries from a CSV exported by this or another tracker"""
+    report = None
+    if request.method == 'POST':
+        form = HistoryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                report = import_history(request.user, open_history_file(upload.file, upload.name))
+                messages.success(request, f'Imported {report["created"]} entries.')
+            except (ValueError, OSError, csv.Error) as e:
+                messages.error(request, f'Could not read the file: {e}')
+            except Exception as e:
+                logger.error(f'Error importing history for user {request.user.username}: {e}')
+                messages.error(request, 'An error occurred while importing your history. Please try again.')
+    else:
+        form = HistoryImportForm()
+    
+    return TemplateResponse(request, 'calories/import_history.html', {'form': form, 'report': report})
 
 @login_required
 def edit_entry(request, entry_id):
@@ -189,7 +404,8 @@ def edit_entry(request, entry_id):
         form = CalorieEntryForm(request.POST, instance=entry)
         if form.is_valid():
             try:
-                form.save()
+                with transaction.atomic():
+                    form.save()
                 messages.success(request, 'Entry updated successfully!')
                 return redirect('calorie_history')
             except Exception as e:
@@ -198,7 +414,7 @@ def edit_entry(request, entry_id):
     else:
         form = CalorieEntryForm(instance=entry)
     
-    return render(request, 'calories/edit_entry.html', {'form': form, 'entry': entry})
+    return TemplateResponse(request, 'calories/edit_entry.html', {'form': form, 'entry': entry})
 
 @login_required
 def delete_entry(request, entry_id):
@@ -208,14 +424,15 @@ def delete_entry(request, entry_id):
     if request.method == 'POST':
         try:
             food_name = entry.food.name
-            entry.delete()
+            with transaction.atomic():
+                entry.delete()
             messages.success(request, f'Entry for {food_name} deleted successfully!')
             return redirect('calorie_history')
         except Exception as e:
             logger.error(f'Error deleting entry {entry_id} for user {request.user.username}: {e}')
             messages.error(request, 'An error occurred while deleting your entry. Please try again.')
     
-    return render(request, 'calories/delete_entry.html', {'entry': entry})
+    return TemplateResponse(request, 'calories/delete_entry.html', {'entry': entry})
 
 @login_required
 def profile_settings(request):
@@ -238,26 +455,29 @@ def profile_settings(request):
     else:
         form = UserProfileForm(instance=profile)
     
-    return render(request, 'calories/profile.html', {'form': form})
+    return TemplateResponse(request, 'calories/profile.html', {'form': form})
 
 @login_required
-def weekly_report(request):
+@conditional_page
+@read_from_replica
+async def weekly_report(request):
     """Weekly calorie report"""
     today = date.today()
     week_start = today - timedelta(days=today.weekday())
     week_end = week_start + timedelta(days=6)
+    user = await request.auser()
     
     # Get user's calorie goal
-    profile = UserProfile.objects.get_or_create(
-        user=request.user,
+    profile = (await UserProfile.objects.aget_or_create(
+        user=user,
         defaults={'daily_calorie_goal': 2000}
-    )[0]
+    ))[0]
     
     # Get this week's data
     weekly_entries = CalorieEntry.objects.filter(
-        user=request.user,
+        user=user,
         date__range=[week_start, week_end]
-    ).select_related('food')
+    ).select_related('food').order_by('-date', '-time_added')
     
     # Organize data by day
     daily_data = {}
@@ -270,11 +490,14 @@ def weekly_report(request):
             'day_name': day.strftime('%A')
         }
     
-    # Populate daily data
-    for entry in weekly_entries:
+    # Populate daily data; totals come from the rollup
+    async for entry in weekly_entries:
         if entry.date in daily_data:
             daily_data[entry.date]['entries'].append(entry)
-            daily_data[entry.date]['total_calories'] += entry.total_calories
+    
+    week_totals = await DailyTotal.objects.adaily_totals(user, week_start, week_end)
+    for day, calories in week_totals.items():
+        daily_data[day]['total_calories'] = calories
     
     # Calculate weekly stats
     total_week_calories = sum(day['total_calories'] for day in daily_data.values())
@@ -291,4 +514,99 @@ def weekly_report(request):
         'goal_difference': goal_difference,
     }
     
-    return render(request, 'calories/weekly_report.html', context)
\ No newline at end of file
+    return TemplateResponse(request, 'calories/weekly_report.html', context)
+
+def shift_month(day, months):
+    """First day of the month ``months`` away from ``day``'s month"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+@login_required
+@read_from_replica
+def monthly_report(request):
+    """Monthly calorie report, one bar per day"""
+    this_month = date.today().replace(day=1)
+    try:
+        year, month = map(int, request.GET.get('month', '').split('-'))
+        month_start = date(year, month, 1)
+    except ValueError:
+        month_start = this_month
+    month_start = min(month_start, this_month)
+    
+    profile = UserProfile.objects.get_or_create(
+        user=request.user,
+        defaults={'daily_calorie_goal': 2000}
+    )[0]
+    goal = profile.daily_calorie_goal
+    
+    report = get_month_report(request.user, month_start.year, month_start.month)
+    days = [
+        {
+            'date': day,
+            'total_calories': calories,
+            'on_target': profile.meets_goal(calories),
+        }
+        for day, calories in report['days'].items()
+    ]
+    avg_daily_calories = report['total_calories'] / report['days_logged'] if report['days_logged'] else 0
+    
+    context = {
+        'days': days,
+        'month_start': month_start,
+        'previous_month': shift_month(month_start, -1) if month_start > date.min else None,
+        'next_month': shift_month(month_start, 1) if month_start < this_month else None,
+        'total_calories': report['total_calories'],
+        'days_logged': report['days_logged'],
+        'days_on_target': sum(1 for day in days if day['on_target']),
+        'avg_daily_calories': avg_daily_calories,
+        'daily_goal': goal,
+        'goal_difference': avg_daily_calories - goal if report['days_logged'] else 0,
+    }
+    
+    return TemplateResponse(request, 'calories/monthly_report.html', context)
+
+@login_required
+@read_from_replica
+def yearly_report(request):
+    """Yearly calorie report, one bar per month"""
+    this_year = date.today().year
+    try:
+        year = min(int(request.GET.get('year', this_year)), this_year)
+        date(year, 1, 1)
+    except ValueError:
+        year = this_year
+    
+    profile = UserProfile.objects.get_or_create(
+        user=request.user,
+        defaults={'daily_calorie_goal': 2000}
+    )[0]
+    goal = profile.daily_calorie_goal
+    
+    report = get_year_report(request.user, year)
+    months = [
+        {
+            **row,
+            'avg_daily_calories': row['calories'] / row['days_logged'] if row['days_logged'] else 0,
+        }
+        for row in report['months']
+    ]
+    avg_daily_calories = report['total_calories'] / report['days_logged'] if report['days_logged'] else 0
+    
+    context = {
+        'months': months,
+        'year': year,
+        'previous_year': year - 1 if year > 1 else None,
+        'next_year': year + 1 if year < this_year else None,
+        'total_calories': report['total_calories'],
+        'days_logged': report['days_logged'],
+        'avg_daily_calories': avg_daily_calories,
+        'daily_goal': goal,
+        'goal_difference': avg_daily_calories - goal if report['days_logged'] else 0,
+    }
+    
+    return TemplateResponse(request, 'calories/yearly_report.html', context)
+
+@staff_member_required
+def cache_stats_api(request):
+    """Per-process cache hit/miss counters (staff only)"""
+    return JsonResponse({'stats': cache_stats()})
@@ -206,7 +206,7 @@ Pillow==10.0.1
         # Procfile for Heroku
         procfile = self.base_dir / "Procfile"
         with open(procfile, 'w') as f:
-            f.write("web: gunicorn nutrition.wsgi\n")
+            f.write("web: gunicorn nutrition.asgi:application -k uvicorn.workers.UvicornWorker\n")
         print("✅ Procfile created (Heroku)")
         
         # runtime.txt for Heroku
@@ -223,7 +223,7 @@ services:
     name: calorietracker
     env: python
     buildCommand: pip install -r requirements.txt && python manage.py collectstatic --noinput && python manage.py migrate
-    startCommand: gunicorn nutrition.wsgi:application
+    startCommand: gunicorn nutrition.asgi:application -k uvicorn.workers.UvicornWorker
     envVars:
       - key: DJANGO_SETTINGS_MODULE
         value: nutrition.production_settings
@@ -35,6 +35,19 @@ DATABASES = {
     )
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and os.environ.get(
+    'SQLITE_TUNED', ''
+).lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['OPTIONS'] = SQLITE_TUNED_OPTIONS
+
+# Read replicas for the reporting views, as comma-separated database URLs
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
 # Static files configuration for production
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -45,8 +58,15 @@ STATICFILES_DIRS = [
 # Enable WhiteNoise for static file serving
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
-# Add WhiteNoise middleware
-MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+# Add WhiteNoise middleware (directly after SecurityMiddleware)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'whitenoise.middleware.WhiteNoiseMiddleware'
+)
+
+# Time a sample of requests (Server-Timing header and slow-request warnings)
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '0.01'))
+REQUEST_TIMING_SLOW_MS = int(os.environ.get('REQUEST_TIMING_SLOW_MS', '500'))
 
 # Security settings for production
 SECURE_BROWSER_XSS_FILTER = True
@@ -113,11 +133,12 @@ if os.environ.get('EMAIL_HOST'):
 else:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
-# Cache configuration (optional - for better performance)
+# Cache shared by all worker processes on the host, in a SQLite file
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'calories.sqlite_cache.SQLiteCache',
+        'LOCATION': os.environ.get('CACHE_SQLITE_PATH', SHARED_CACHE_PATH),
+        'OPTIONS': SHARED_CACHE_OPTIONS,
     }
 }
 
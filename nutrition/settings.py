@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,8 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "calories.middleware.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "calories.middleware.PrimaryPinMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -82,6 +85,48 @@ DATABASES = {
     }
 }
 
+# Opt-in SQLite profile for serving from several worker processes
+# (SQLITE_TUNED=1). WAL lets readers run alongside the single writer;
+# BEGIN IMMEDIATE takes the write lock up front, so a transaction that
+# reads and then writes waits for it instead of failing with "database is
+# locked" when another writer got in between.
+SQLITE_TUNED_OPTIONS = {
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"  # durable with WAL; no fsync per commit
+        "PRAGMA cache_size=-65536;"  # 64 MiB page cache per connection
+        "PRAGMA mmap_size=268435456;"  # memory-map up to 256 MiB of the file
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA busy_timeout=20000;"
+    ),
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+SQLITE_TUNED_CONN_MAX_AGE = 600
+
+if os.environ.get("SQLITE_TUNED", "").lower() in ("1", "true", "yes"):
+    DATABASES["default"]["OPTIONS"] = SQLITE_TUNED_OPTIONS
+    DATABASES["default"]["CONN_MAX_AGE"] = SQLITE_TUNED_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Read replicas: aliases in DATABASE_REPLICAS serve the reads of the
+# reporting views (see calories.routers). For local testing, point
+# SQLITE_REPLICA_NAME at a copy of the database file, e.g. made with
+# sqlite3 db.sqlite3 ".backup replica.sqlite3". Tests mirror it onto the
+# default test database. Trade-off: pages rendered from a replica carry no
+# ETag, since the replica may lag the version the ETag would name, so with
+# replicas configured the history and weekly report are not answered with
+# 304s (except within a user's pin window, when they read the primary).
+DATABASE_ROUTERS = ["calories.routers.ReplicaRouter"]
+DATABASE_REPLICAS = []
+if os.environ.get("SQLITE_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["SQLITE_REPLICA_NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS = ["replica"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -137,6 +182,49 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Seconds before a worker rebuilds its in-memory food search index, so
+# catalog changes made in another process are picked up (None = never)
+FOOD_SEARCH_INDEX_TTL = 300
+
+# Time a typo-tolerant food search may spend ranking candidates, in ms
+FOOD_SEARCH_FUZZY_BUDGET_MS = 20
+
+# Cache shared by every worker process on the host, kept in a SQLite file.
+# Production uses it; set CACHE_SQLITE_PATH to use it here too (the default
+# is a per-process LocMemCache).
+SHARED_CACHE_PATH = os.path.join(tempfile.gettempdir(), "nutrition-cache.sqlite3")
+SHARED_CACHE_OPTIONS = {"MAX_ENTRIES": 100000}
+if os.environ.get("CACHE_SQLITE_PATH"):
+    CACHES = {
+        "default": {
+            "BACKEND": "calories.sqlite_cache.SQLiteCache",
+            "LOCATION": os.environ["CACHE_SQLITE_PATH"],
+            "OPTIONS": SHARED_CACHE_OPTIONS,
+        }
+    }
+
+# Seconds a user's cached dashboard lives; writes invalidate it sooner
+DASHBOARD_CACHE_TIMEOUT = 3600
+
+# Recent/frequent foods: days of history considered, and the per-process
+# cache of per-user results (users held, seconds each is kept)
+RECENT_FOODS_DAYS = 90
+RECENT_FOODS_CACHE_SIZE = 1000
+RECENT_FOODS_CACHE_TTL = 300
+
+# Seconds after a write during which the user's reads stay on the primary;
+# should exceed the replicas' usual lag
+REPLICA_PIN_SECONDS = 10
+
+# Largest number of entries accepted by one batch entry API request
+ENTRY_BATCH_MAX_ITEMS = 100
+
+# Fraction of requests that get Server-Timing headers and a timing log line
+# (every request while developing, 1 in 100 otherwise), and the duration
+# (ms) above which that line is logged as a warning
+REQUEST_TIMING_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+REQUEST_TIMING_SLOW_MS = 500
+
 # Message framework settings
 from django.contrib.messages import constants as messages
 
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition.settings")
 
 application = get_wsgi_application()
+
+# Warm the in-memory food search index so the first autocomplete request
+# does not pay for building it. It is built on a background thread, so
+# loading this module neither waits on nor fails with the database.
+from calories.search import start_warmup
+
+start_warmup()